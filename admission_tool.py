@@ -0,0 +1,198 @@
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Hashable, List, Optional
+
+from .stats_tool import metrics
+
+logger = logging.getLogger("tarots_admission_tool")
+
+# 各阶段的默认并发上限
+DEFAULT_STAGE_LIMITS = {"download": 8, "image": 4, "llm": 4}
+
+
+class AdmissionRejected(Exception):
+    """请求被准入控制拒绝（超出配额或排队已满），消息可直接回复给用户"""
+
+
+class StageLimiter:
+    """
+    可热调整上限的先进先出信号量，上限不大于0时不限制。
+    调小上限时已占用的名额不受影响，释放后按新上限放行。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def is_saturated(self) -> bool:
+        return 0 < self.limit <= self.active
+
+    def resize(self, limit: int):
+        self.limit = limit
+        self._wake()
+
+    async def acquire(self, timeout: Optional[float] = None):
+        """
+        占用一个名额，需要排队时立即登记为等待者（之后的调用能看到排队长度）
+        :param timeout: 最长排队时间（秒），超时抛出 asyncio.TimeoutError；None为一直等待
+        """
+        if (self.limit <= 0 or self.active < self.limit) and not self.waiting:
+            self.active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            if timeout is None:
+                await waiter
+            else:
+                await asyncio.wait_for(waiter, timeout=timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if waiter.done() and not waiter.cancelled():
+                # 已分到名额但调用方被取消，名额转给下一个等待者
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self):
+        self.active -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and (self.limit <= 0 or self.active < self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.active += 1
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class AdmissionController:
+    """
+    插件级的准入控制：
+    - 占卜执行：最多 max_active 个同时进行，其余最多 max_queue 个排队，排队超过 queue_timeout 秒放弃；
+      同一用户、同一聊天进行中（含排队）的占卜数有上限。超出时立即拒绝，而不是让延迟越积越高
+    - 各阶段（下载、图片处理、LLM解牌）各自的并发上限，由所有占卜、预热和缓存指令共享
+    """
+
+    def __init__(self):
+        self.max_active = 0
+        self.max_queue = 0
+        self.queue_timeout = 0.0
+        self.per_user = 0
+        self.per_chat = 0
+        self._executions = StageLimiter(0)
+        self._stages: Dict[str, StageLimiter] = {
+            name: StageLimiter(limit) for name, limit in DEFAULT_STAGE_LIMITS.items()
+        }
+        self._users: Dict[Hashable, int] = {}
+        self._chats: Dict[Hashable, int] = {}
+
+    def configure(
+        self,
+        max_active: int,
+        max_queue: int,
+        queue_timeout: float,
+        per_user: int,
+        per_chat: int,
+        stage_limits: Dict[str, int],
+    ):
+        """热更新配置，所有上限不大于0时为不限制"""
+        self.max_active = max_active
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.per_user = per_user
+        self.per_chat = per_chat
+        self._executions.resize(max_active)
+        for name, limit in stage_limits.items():
+            limiter = self._stages.get(name)
+            if limiter is None:
+                self._stages[name] = StageLimiter(limit)
+            elif limiter.limit != limit:
+                limiter.resize(limit)
+
+    def stage(self, name: str):
+        """占用一个阶段名额的异步上下文管理器，未知阶段不限制"""
+        limiter = self._stages.get(name)
+        if limiter is None:
+            limiter = self._stages[name] = StageLimiter(0)
+        return limiter.slot()
+
+    @asynccontextmanager
+    async def admit(self, user_key: Optional[Hashable], chat_key: Optional[Hashable]) -> AsyncIterator[None]:
+        """
+        申请执行一次占卜，超出配额或排队已满时抛出 AdmissionRejected
+        :param user_key: 用户标识，None为不做用户配额
+        :param chat_key: 聊天流标识，None为不做聊天配额
+        """
+        if user_key is not None and 0 < self.per_user <= self._users.get(user_key, 0):
+            self._reject("user")
+            raise AdmissionRejected("你的上一次占卜还没结束，稍后再试吧")
+        if chat_key is not None and 0 < self.per_chat <= self._chats.get(chat_key, 0):
+            self._reject("chat")
+            raise AdmissionRejected("这里正在占卜的人太多了，稍后再试吧")
+        if self._executions.is_saturated() and self._executions.waiting >= self.max_queue:
+            self._reject("queue")
+            raise AdmissionRejected("现在占卜的人太多了，稍后再试吧")
+
+        self._hold(self._users, user_key, 1)
+        self._hold(self._chats, chat_key, 1)
+        try:
+            try:
+                await self._executions.acquire(self.queue_timeout if self.queue_timeout > 0 else None)
+            except asyncio.TimeoutError:
+                self._reject("timeout")
+                raise AdmissionRejected("排队的人太多了，稍后再试吧") from None
+            try:
+                metrics.incr("admission.admitted")
+                yield
+            finally:
+                self._executions.release()
+        finally:
+            self._hold(self._users, user_key, -1)
+            self._hold(self._chats, chat_key, -1)
+
+    def status_lines(self) -> List[str]:
+        """各上限的当前占用，供统计指令展示"""
+        def usage(limiter: StageLimiter) -> str:
+            limit = limiter.limit if limiter.limit > 0 else "不限"
+            return f"{limiter.active}/{limit}（排队{limiter.waiting}）"
+
+        lines = [f"占卜执行: {usage(self._executions)}"]
+        for name, limiter in sorted(self._stages.items()):
+            lines.append(f"{name}: {usage(limiter)}")
+        return lines
+
+    @staticmethod
+    def _hold(counts: Dict[Hashable, int], key: Optional[Hashable], delta: int):
+        if key is None:
+            return
+        value = counts.get(key, 0) + delta
+        if value > 0:
+            counts[key] = value
+        else:
+            counts.pop(key, None)
+
+    @staticmethod
+    def _reject(reason: str):
+        metrics.incr(f"admission.rejected.{reason}")
+        logger.info(f"[准入控制] 拒绝占卜请求: {reason}")
+
+
+admission = AdmissionController()
@@ -0,0 +1,236 @@
+"""
+离线基准测试用的 MaiBot 桩模块。
+
+只实现插件实际用到的 src.plugin_system 等接口：发送消息只做记录，
+LLM重写按配置的延迟返回固定文本，不连接数据库、不访问网络。
+调用 install() 后再导入插件即可在没有麦麦的环境中运行。
+"""
+
+import asyncio
+import enum
+import logging
+import sys
+import types
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class StubSettings:
+    """桩模块的可调参数，由基准测试脚本修改"""
+
+    llm_latency: float = 0.0   # 模拟 generator_api.rewrite_reply 的耗时（秒）
+    send_latency: float = 0.0  # 模拟每条消息的发送耗时（秒）
+    self_id: str = "10000"
+
+
+class SentLog:
+    """记录桩发送的消息，便于核对执行结果"""
+
+    messages: List[Tuple[str, int]] = []
+
+    @classmethod
+    def add(cls, kind: str, payload: str):
+        cls.messages.append((kind, len(payload)))
+
+    @classmethod
+    def clear(cls):
+        cls.messages = []
+
+
+class ActionActivationType(enum.Enum):
+    NEVER = "never"
+    ALWAYS = "always"
+    LLM_JUDGE = "llm_judge"
+    RANDOM = "random"
+    KEYWORD = "keyword"
+
+
+class EventType(enum.Enum):
+    ON_START = "on_start"
+    ON_STOP = "on_stop"
+    ON_MESSAGE = "on_message"
+
+
+class ComponentInfo:
+    def __init__(self, name: str, component_type: str):
+        self.name = name
+        self.component_type = component_type
+
+
+class ConfigField:
+    def __init__(self, type: Any = str, default: Any = None, description: str = "", **kwargs):
+        self.type = type
+        self.default = default
+        self.description = description
+        self.extra = kwargs
+
+
+class ChatStream:
+    def __init__(self, stream_id: str):
+        self.stream_id = stream_id
+
+
+async def _simulated_send(kind: str, payload: str) -> bool:
+    if StubSettings.send_latency:
+        await asyncio.sleep(StubSettings.send_latency)
+    SentLog.add(kind, payload)
+    return True
+
+
+class BaseAction:
+    def __init__(
+        self,
+        action_data: dict,
+        reasoning: str,
+        cycle_timers: dict,
+        thinking_id: str,
+        global_config: Optional[dict] = None,
+        chat_stream: Optional[ChatStream] = None,
+        log_prefix: str = "[Bench]",
+        **kwargs,
+    ):
+        self.action_data = action_data
+        self.reasoning = reasoning
+        self.cycle_timers = cycle_timers
+        self.thinking_id = thinking_id
+        self.global_config = global_config
+        self.chat_stream = chat_stream or ChatStream("bench_chat")
+        self.log_prefix = log_prefix
+
+    async def send_text(self, content: str, **kwargs) -> bool:
+        return await _simulated_send("text", content)
+
+    async def send_image(self, image_base64: str, **kwargs) -> bool:
+        return await _simulated_send("image", image_base64)
+
+    async def store_action_info(self, **kwargs):
+        return None
+
+    @classmethod
+    def get_action_info(cls) -> ComponentInfo:
+        return ComponentInfo(getattr(cls, "action_name", cls.__name__), "action")
+
+
+class BaseCommand:
+    def __init__(self, message: Any = None, plugin_config: Optional[dict] = None, **kwargs):
+        self.message = message
+        self.plugin_config = plugin_config or {}
+        self.matched_groups: Dict[str, Optional[str]] = {}
+        self.log_prefix = "[Bench]"
+
+    def set_matched_groups(self, groups: Dict[str, Optional[str]]):
+        self.matched_groups = groups
+
+    async def send_text(self, content: str, **kwargs) -> bool:
+        return await _simulated_send("text", content)
+
+    async def send_image(self, image_base64: str, **kwargs) -> bool:
+        return await _simulated_send("image", image_base64)
+
+    @classmethod
+    def get_command_info(cls) -> ComponentInfo:
+        return ComponentInfo(getattr(cls, "command_name", cls.__name__), "command")
+
+
+class BaseEventHandler:
+    @classmethod
+    def get_handler_info(cls) -> ComponentInfo:
+        return ComponentInfo(getattr(cls, "handler_name", cls.__name__), "event_handler")
+
+
+class BasePlugin:
+    def __init__(self, plugin_dir: str = "", **kwargs):
+        self.plugin_dir = plugin_dir
+
+    def get_config(self, key: str, default: Any = None) -> Any:
+        return default
+
+
+def register_plugin(cls):
+    return cls
+
+
+class _LLMResponse:
+    def __init__(self, text: str):
+        self.reply_set = [("text", text)]
+
+
+async def rewrite_reply(chat_stream=None, reply_data: Optional[dict] = None, **kwargs):
+    if StubSettings.llm_latency:
+        await asyncio.sleep(StubSettings.llm_latency)
+    raw = (reply_data or {}).get("raw_reply", "")
+    return True, _LLMResponse(f"解牌：{raw[:200]}")
+
+
+def get_global_config(key: str, default: Any = None) -> Any:
+    if key == "bot.qq_account":
+        return StubSettings.self_id
+    return default
+
+
+async def db_get(*args, **kwargs):
+    return []
+
+
+class Person:
+    def __init__(self, platform: str = "", user_id: str = "", person_id: str = "", **kwargs):
+        self.person_id = person_id or f"{platform}:{user_id}"
+        self.is_known = False
+        self.person_name = None
+
+
+def get_person_id(platform: str, user_id: str) -> str:
+    return f"{platform}:{user_id}"
+
+
+def is_person_known(*args, **kwargs) -> bool:
+    return False
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def _module(name: str, **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """把桩模块注册到 sys.modules，已注册时不重复注册"""
+    if "src.plugin_system" in sys.modules:
+        return
+    _module("src")
+    _module("src.common")
+    _module("src.common.logger", get_logger=get_logger)
+    _module("src.common.database")
+    _module("src.common.database.database_model", Messages=object, PersonInfo=object)
+    _module("src.person_info")
+    _module(
+        "src.person_info.person_info",
+        person_info_manager=None,
+        Person=Person,
+        get_person_id=get_person_id,
+        is_person_known=is_person_known,
+    )
+    _module("src.plugin_system")
+    _module("src.plugin_system.base")
+    _module("src.plugin_system.base.base_plugin", BasePlugin=BasePlugin)
+    _module("src.plugin_system.base.base_action", BaseAction=BaseAction, ActionActivationType=ActionActivationType)
+    _module("src.plugin_system.base.base_command", BaseCommand=BaseCommand)
+    _module("src.plugin_system.base.base_events_handler", BaseEventHandler=BaseEventHandler)
+    _module("src.plugin_system.base.component_types", ComponentInfo=ComponentInfo, EventType=EventType)
+    _module("src.plugin_system.base.config_types", ConfigField=ConfigField)
+    generator_api = _module("src.plugin_system.apis.generator_api", rewrite_reply=rewrite_reply)
+    database_api = _module("src.plugin_system.apis.database_api", db_get=db_get)
+    config_api = _module("src.plugin_system.apis.config_api", get_global_config=get_global_config)
+    send_api = _module("src.plugin_system.apis.send_api")
+    _module("src.plugin_system.apis.plugin_register_api", register_plugin=register_plugin)
+    _module(
+        "src.plugin_system.apis",
+        generator_api=generator_api,
+        database_api=database_api,
+        config_api=config_api,
+        send_api=send_api,
+    )
@@ -0,0 +1,269 @@
+"""
+塔罗牌插件离线基准测试。
+
+在临时目录中复制一份插件（只包含所选牌组的数据和仓库自带的 tarots_cache 图片），
+用桩模块代替 src.plugin_system，逐项计时插件的热点路径，结果以JSON输出，便于不同版本间对比。
+
+用法（在插件目录下运行）:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py -n 50 --output new.json --baseline old.json
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).parent.absolute()
+PLUGIN_DIR = BENCH_DIR.parent
+PACKAGE_NAME = "tarots_bench"
+
+sys.path.insert(0, str(BENCH_DIR))
+import maibot_stub  # noqa: E402
+
+BENCH_CONFIG = """\
+[cards]
+using_cards = "{deck}"
+use_cards = ["{deck}"]
+
+[send]
+global_rate = 0
+chat_rate = 0
+
+[cache]
+payload_cache_mb = {payload_cache_mb}
+"""
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """把一组耗时（秒）汇总为毫秒统计"""
+    ordered = sorted(samples)
+    ms = [s * 1000 for s in ordered]
+    p95_index = min(len(ms) - 1, max(0, round(0.95 * len(ms)) - 1))
+    return {
+        "n": len(ms),
+        "min_ms": round(ms[0], 4),
+        "median_ms": round(statistics.median(ms), 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p95_ms": round(ms[p95_index], 4),
+        "max_ms": round(ms[-1], 4),
+        "stdev_ms": round(statistics.stdev(ms), 4) if len(ms) > 1 else 0.0,
+    }
+
+
+class Bench:
+    def __init__(self, iterations: int, warmup: int):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.results: Dict[str, Dict[str, float]] = {}
+
+    def sync(self, name: str, func: Callable[[], Any], setup: Optional[Callable[[], Any]] = None):
+        for _ in range(self.warmup):
+            if setup:
+                setup()
+            func()
+        samples = []
+        for _ in range(self.iterations):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        self.results[name] = summarize(samples)
+        logging.getLogger("bench").info(f"{name}: {self.results[name]['median_ms']}ms")
+
+    async def run_async(self, name: str, func: Callable[[], Awaitable[Any]], setup: Optional[Callable[[], Any]] = None):
+        for _ in range(self.warmup):
+            if setup:
+                setup()
+            await func()
+        samples = []
+        for _ in range(self.iterations):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            await func()
+            samples.append(time.perf_counter() - start)
+        self.results[name] = summarize(samples)
+        logging.getLogger("bench").info(f"{name}: {self.results[name]['median_ms']}ms")
+
+
+def prepare_sandbox(deck: str, payload_cache_mb: int) -> Path:
+    """复制插件代码、所选牌组数据和自带图片缓存到临时目录，避免基准测试改动仓库文件"""
+    source_images = PLUGIN_DIR / "tarots_cache" / deck
+    if not any(source_images.glob("*_norm.png")):
+        raise SystemExit(f"tarots_cache/{deck} 下没有自带图片，无法离线测试")
+    root = Path(tempfile.mkdtemp(prefix="tarots_bench_"))
+    package = root / PACKAGE_NAME
+    package.mkdir()
+    for source in PLUGIN_DIR.glob("*.py"):
+        shutil.copy2(source, package / source.name)
+    (package / "tarot_jsons").mkdir()
+    shutil.copy2(PLUGIN_DIR / "tarot_jsons" / "formation.json", package / "tarot_jsons" / "formation.json")
+    shutil.copytree(PLUGIN_DIR / "tarot_jsons" / deck, package / "tarot_jsons" / deck)
+    target_images = package / "tarots_cache" / deck
+    target_images.mkdir(parents=True)
+    for image in source_images.glob("*_norm.png"):
+        shutil.copy2(image, target_images / image.name)
+    (package / "config.toml").write_text(
+        BENCH_CONFIG.format(deck=deck, payload_cache_mb=payload_cache_mb), encoding="utf-8"
+    )
+    return root
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PLUGIN_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run_suite(args: argparse.Namespace, root: Path) -> Dict[str, Any]:
+    maibot_stub.install()
+    maibot_stub.StubSettings.llm_latency = args.llm_latency
+    maibot_stub.StubSettings.send_latency = args.send_latency
+    sys.path.insert(0, str(root))
+    plugin = importlib.import_module(f"{PACKAGE_NAME}.plugin")
+    file_tool = importlib.import_module(f"{PACKAGE_NAME}.file_tool")
+    random.seed(args.seed)
+
+    bench = Bench(args.iterations, args.warmup)
+    target_message = "测试用户:帮我抽一次塔罗牌"
+
+    def new_action(formation: str = "单张") -> Any:
+        return plugin.TarotsAction(
+            action_data={
+                "card_type": "全部",
+                "formation": formation,
+                "target_message": target_message,
+                "seed": random.getrandbits(63),
+            },
+            reasoning="benchmark",
+            cycle_timers={},
+            thinking_id="benchmark",
+        )
+
+    bench.sync("action.__init__", new_action)
+
+    action = new_action()
+    bench.sync("load_resources.warm", action._load_resources)
+    bench.sync("load_resources.cold", action._load_resources, setup=plugin.deck_registry.invalidate)
+
+    card_path = action.deck_cache.norm_path("0")
+    card_bytes = card_path.read_bytes()
+    bench.sync("validate_image_integrity", lambda: action._validate_image_integrity(card_path))
+    bench.sync("rotate_image", lambda: action._rotate_image(card_bytes))
+    bench.sync("base64.original", lambda: file_tool.read_base64(card_path))
+
+    profile = action._get_transport_profile()
+    if profile:
+        transport_path = await action._ensure_transport_image("0", False, profile)
+        if transport_path:
+            bench.sync("base64.transport", lambda: file_tool.read_base64(transport_path))
+
+    # 先把所有派生图片生成好，整套流程只测量稳态
+    await action._cache_cards(action._get_cacheable_ids(), concurrency=8)
+
+    formations = list(plugin.deck_registry.get_formations(args.deck))
+    for formation in formations:
+        formation_action = new_action(formation)
+
+        async def execute() -> None:
+            success, message = await formation_action.execute()
+            if not success:
+                raise RuntimeError(f"{formation} 执行失败: {message}")
+
+        await bench.run_async(f"execute.{formation}", execute)
+        await bench.run_async(
+            f"execute_cold_payload.{formation}",
+            execute,
+            setup=lambda: plugin.payload_cache.invalidate(formation_action.deck_cache.deck_name),
+        )
+
+    plugin.worker_pool.shutdown()
+    return bench.results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """与基线结果按中位数对比，change 为相对变化（正数表示变慢）"""
+    base_results = baseline.get("results", {})
+    comparison = {}
+    for name, stats in results.items():
+        base = base_results.get(name)
+        if not base or not base.get("median_ms"):
+            continue
+        comparison[name] = {
+            "baseline_median_ms": base["median_ms"],
+            "median_ms": stats["median_ms"],
+            "change": round(stats["median_ms"] / base["median_ms"] - 1, 4),
+        }
+    return comparison
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="塔罗牌插件离线基准测试")
+    parser.add_argument("-n", "--iterations", type=int, default=20, help="每项计时的次数")
+    parser.add_argument("--warmup", type=int, default=2, help="每项正式计时前的预热次数")
+    parser.add_argument("--deck", default="bilibili", help="使用的牌组（需要在tarots_cache中自带图片）")
+    parser.add_argument("--seed", type=int, default=0, help="抽牌随机种子")
+    parser.add_argument("--payload-cache-mb", type=int, default=32, help="内存图片缓存上限（MB）")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="模拟LLM重写耗时（秒）")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="模拟每条消息发送耗时（秒）")
+    parser.add_argument("--output", type=Path, help="结果JSON写入的文件，默认输出到标准输出")
+    parser.add_argument("--baseline", type=Path, help="用于对比的旧结果JSON")
+    parser.add_argument("--keep-sandbox", action="store_true", help="保留临时目录以便检查")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出插件日志")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+    logging.getLogger("bench").setLevel(logging.INFO)
+
+    root = prepare_sandbox(args.deck, args.payload_cache_mb)
+    try:
+        results = asyncio.run(run_suite(args, root))
+    finally:
+        if not args.keep_sandbox:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "deck": args.deck,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "llm_latency": args.llm_latency,
+            "send_latency": args.send_latency,
+            "payload_cache_mb": args.payload_cache_mb,
+        },
+        "results": results,
+    }
+    if args.baseline:
+        report["comparison"] = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
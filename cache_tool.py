@@ -0,0 +1,318 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .download_tool import SingleFlight
+from .file_tool import DebouncedSave, atomic_write_bytes, load_json, save_json
+from .image_tool import TransportProfile, render_thumbnail, render_transport, rotate_image_file
+from .worker_tool import worker_pool
+
+logger = logging.getLogger("tarots_cache_tool")
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+# 合并多次登记后再写入清单的等待时间（秒）
+MANIFEST_SAVE_DELAY = 1.0
+
+# 清单校验结果
+CACHE_VALID = "valid"      # 文件与清单记录一致，可直接使用
+CACHE_STALE = "stale"      # 清单记录的来源地址与当前牌组不一致，需要重新下载
+CACHE_UNKNOWN = "unknown"  # 没有记录或文件已变化，需要完整解码校验
+
+
+def hash_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    """计算文件的sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DeckCache:
+    """
+    单个牌组的本地图片缓存目录。
+    正位原图 <id>_norm.png 是唯一的下载来源，其余图片（逆位 <id>_rev.png 等）
+    都由原图派生；派生图片比原图旧时视为过期，会在下次使用时重新生成。
+    目录下的 manifest.json 记录每张通过完整校验的原图的大小、修改时间、sha256
+    和来源地址，命中缓存时只需一次stat比对，不必每次完整解码图片。
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.deck_name = cache_dir.name
+        self.manifest_path = cache_dir / MANIFEST_NAME
+        self._manifest_lock = threading.RLock()
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._saver = DebouncedSave(self.save_manifest, MANIFEST_SAVE_DELAY)
+
+    def norm_path(self, card_id: str) -> Path:
+        """正位原图路径"""
+        return self.cache_dir / f"{card_id}_norm.png"
+
+    def rev_path(self, card_id: str) -> Path:
+        """逆位图片路径"""
+        return self.cache_dir / f"{card_id}_rev.png"
+
+    def image_path(self, card_id: str, is_reverse: bool) -> Path:
+        return self.rev_path(card_id) if is_reverse else self.norm_path(card_id)
+
+    def transport_path(self, card_id: str, is_reverse: bool, profile: TransportProfile) -> Path:
+        """发送用派生图片路径，存放在牌组缓存目录的transport子目录下"""
+        orientation = "rev" if is_reverse else "norm"
+        return self.cache_dir / "transport" / f"{card_id}_{orientation}.{profile.key}{profile.suffix}"
+
+    def thumbnail_path(self, card_id: str, width: int) -> Path:
+        """拼图用缩略图路径，存放在牌组缓存目录的thumbs子目录下"""
+        return self.cache_dir / "thumbs" / f"{card_id}_norm.w{width}.png"
+
+    def is_fresh(self, card_id: str, derived_path: Path) -> bool:
+        """派生图片存在且不早于正位原图"""
+        try:
+            return derived_path.stat().st_mtime_ns >= self.norm_path(card_id).stat().st_mtime_ns
+        except OSError:
+            return False
+
+    async def ensure_reversed(self, card_id: str) -> Optional[Path]:
+        """
+        确保逆位图片存在且与正位原图一致，必要时由原图旋转生成
+        :return: 逆位图片路径，正位原图不存在时返回None
+        """
+        return await self._ensure_derived(card_id, self.rev_path(card_id), rotate_image_file, self.norm_path(card_id))
+
+    async def ensure_transport(self, card_id: str, is_reverse: bool, profile: TransportProfile) -> Optional[Path]:
+        """
+        确保发送用派生图片存在且与正位原图一致，必要时由原图生成
+        :return: 派生图片路径，正位原图不存在时返回None
+        """
+        return await self._ensure_derived(
+            card_id,
+            self.transport_path(card_id, is_reverse, profile),
+            render_transport,
+            self.norm_path(card_id),
+            profile,
+            is_reverse,
+        )
+
+    async def ensure_thumbnail(self, card_id: str, width: int) -> Optional[Path]:
+        """
+        确保拼图用缩略图存在且与正位原图一致，必要时由原图生成
+        :return: 缩略图路径，正位原图不存在时返回None
+        """
+        return await self._ensure_derived(
+            card_id, self.thumbnail_path(card_id, width), render_thumbnail, self.norm_path(card_id), width
+        )
+
+    async def _ensure_derived(self, card_id: str, path: Path, render: Callable[..., bytes], *args) -> Optional[Path]:
+        """派生图片过期时在工作池中重新生成；同一文件的并发生成只执行一次"""
+        if self.is_fresh(card_id, path):
+            return path
+        if not self.norm_path(card_id).exists():
+            return None
+
+        async def build() -> Path:
+            if not self.is_fresh(card_id, path):
+                data = await worker_pool.run_cpu(render, *args)
+                await worker_pool.run_io(atomic_write_bytes, path, data)
+                logger.info(f"已生成派生图片 {self.deck_name}/{path.name}")
+            return path
+
+        return await _build_flights.run(path, build)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if self._manifest is None:
+            manifest = load_json(self.manifest_path, {}, "缓存清单")
+            if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+                manifest = {"version": MANIFEST_VERSION, "files": {}}
+            self._manifest = manifest
+        return self._manifest
+
+    def check(self, card_id: str, url: str) -> str:
+        """
+        用清单快速校验正位原图
+        :param card_id: 卡牌ID
+        :param url: 该卡牌当前的下载地址
+        :return: CACHE_VALID / CACHE_STALE / CACHE_UNKNOWN
+        """
+        path = self.norm_path(card_id)
+        with self._manifest_lock:
+            entry = self._load_manifest()["files"].get(path.name)
+            if entry is None:
+                return CACHE_UNKNOWN
+            if entry.get("url") != url:
+                return CACHE_STALE
+            try:
+                stat = path.stat()
+            except OSError:
+                return CACHE_UNKNOWN
+            if stat.st_size == entry.get("size") and stat.st_mtime_ns == entry.get("mtime_ns"):
+                return CACHE_VALID
+            return CACHE_UNKNOWN
+
+    def entry(self, card_id: str) -> Optional[Dict[str, Any]]:
+        """清单中一张正位原图的记录副本，没有记录时返回None"""
+        with self._manifest_lock:
+            entry = self._load_manifest()["files"].get(self.norm_path(card_id).name)
+            return dict(entry) if entry is not None else None
+
+    def record(
+        self,
+        card_id: str,
+        url: str,
+        sha256: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        """
+        登记一张已通过完整校验的正位原图
+        :param card_id: 卡牌ID
+        :param url: 图片来源地址
+        :param sha256: 已知的内容哈希（例如下载时边下边算），不传则读取文件计算
+        :param etag: 服务器返回的ETag，刷新缓存时用于条件请求
+        :param last_modified: 服务器返回的Last-Modified，刷新缓存时用于条件请求
+        """
+        path = self.norm_path(card_id)
+        stat = path.stat()
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256 or hash_file(path),
+            "url": url,
+        }
+        if etag:
+            entry["etag"] = etag
+        if last_modified:
+            entry["last_modified"] = last_modified
+        with self._manifest_lock:
+            self._load_manifest()["files"][path.name] = entry
+            self._saver.schedule()
+
+    def forget(self, card_id: str):
+        """从清单中移除一张原图的记录"""
+        with self._manifest_lock:
+            if self._load_manifest()["files"].pop(self.norm_path(card_id).name, None) is not None:
+                self._saver.schedule()
+
+    def has_unsaved_manifest(self) -> bool:
+        """清单是否有尚未落盘的修改"""
+        return self._saver.pending
+
+    def save_manifest(self):
+        """把清单原子写入缓存目录"""
+        with self._manifest_lock:
+            self._saver.cancel()
+            if self._manifest is not None:
+                save_json(self.manifest_path, self._manifest, "缓存清单")
+
+    def discard_derived(self, card_id: str):
+        """正位原图被重新下载后，删除由旧原图派生的图片和内存中的发送负载"""
+        payload_cache.invalidate(self.deck_name, card_id)
+        derived = [self.rev_path(card_id)]
+        for sub_dir in ("transport", "thumbs"):
+            if (self.cache_dir / sub_dir).exists():
+                derived.extend((self.cache_dir / sub_dir).glob(f"{card_id}_*"))
+        for path in derived:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# (牌组, 卡牌ID, 正逆位, 发送规格)
+PayloadKey = Tuple[str, str, str, str]
+
+
+class PayloadCache:
+    """
+    发送负载（base64字符串）的进程内LRU缓存，按总字节数淘汰。
+    一个牌组最多只有 78×2 种负载，命中时无需任何磁盘读取和编码。
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[PayloadKey, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: PayloadKey) -> Optional[str]:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key: PayloadKey, payload: str):
+        with self._lock:
+            if len(payload) > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = payload
+            self._size += len(payload)
+            self._evict()
+
+    def resize(self, max_bytes: int):
+        """调整字节上限（配置热重载），超出部分立即淘汰"""
+        with self._lock:
+            if max_bytes != self.max_bytes:
+                self.max_bytes = max_bytes
+                self._evict()
+
+    def invalidate(self, deck_name: str, card_id: Optional[str] = None):
+        """移除某个牌组（或牌组中某张牌）的全部负载"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == deck_name and (card_id is None or k[1] == card_id)]:
+                self._size -= len(self._entries.pop(key))
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            _, payload = self._entries.popitem(last=False)
+            self._size -= len(payload)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """命中/未命中计数和当前占用"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+payload_cache = PayloadCache()
+_build_flights = SingleFlight()
+
+_deck_caches: Dict[Path, DeckCache] = {}
+_deck_caches_lock = threading.Lock()
+
+
+def get_deck_cache(cache_dir: Path) -> DeckCache:
+    """获取进程内共享的牌组缓存对象"""
+    with _deck_caches_lock:
+        deck_cache = _deck_caches.get(cache_dir)
+        if deck_cache is None:
+            deck_cache = _deck_caches[cache_dir] = DeckCache(cache_dir)
+        return deck_cache
+
+
+def save_all_manifests():
+    """立即写入所有牌组尚未落盘的缓存清单（插件卸载或麦麦关闭时调用）"""
+    with _deck_caches_lock:
+        deck_caches = list(_deck_caches.values())
+    for deck_cache in deck_caches:
+        if deck_cache.has_unsaved_manifest():
+            deck_cache.save_manifest()
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger("tarots_coalesce_tool")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _Batch(Generic[T, R]):
+    def __init__(self):
+        self.items: List[Tuple[T, asyncio.Future]] = []
+        self.full = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class Coalescer(Generic[T, R]):
+    """
+    按键（例如聊天流）合并短时间内到达的请求：第一个请求打开一个时间窗口，
+    窗口结束或攒满 max_batch 个请求后，由第一个请求提供的处理函数一次处理整批，
+    每个请求各自拿到自己的结果。某个请求被取消不会中断整批的处理。
+    """
+
+    def __init__(self):
+        self._open: Dict[Hashable, _Batch] = {}
+
+    async def submit(
+        self,
+        key: Hashable,
+        item: T,
+        window: float,
+        max_batch: int,
+        flush: Callable[[List[T]], Awaitable[List[R]]],
+    ) -> R:
+        """
+        :param key: 合并键，只有同一个键的请求会被合并
+        :param item: 本次请求
+        :param window: 合并窗口（秒）
+        :param max_batch: 一批最多合并的请求数，攒满后立即处理
+        :param flush: 处理整批请求的函数，按顺序返回每个请求的结果（只使用打开窗口的请求提供的函数）
+        :return: 本次请求的结果
+        """
+        batch = self._open.get(key)
+        if batch is None:
+            batch = self._open[key] = _Batch()
+            batch.task = asyncio.ensure_future(self._run(key, batch, window, flush))
+        future = asyncio.get_running_loop().create_future()
+        batch.items.append((item, future))
+        if len(batch.items) >= max(1, max_batch):
+            self._close(key, batch)
+            batch.full.set()
+        return await asyncio.shield(future)
+
+    def _close(self, key: Hashable, batch: _Batch):
+        """停止接收新请求，之后到达的请求会打开新的一批"""
+        if self._open.get(key) is batch:
+            del self._open[key]
+
+    async def _run(self, key: Hashable, batch: _Batch, window: float, flush: Callable[[List[T]], Awaitable[List[R]]]):
+        try:
+            await asyncio.wait_for(batch.full.wait(), timeout=window)
+        except asyncio.TimeoutError:
+            pass
+        self._close(key, batch)
+        items = [item for item, _ in batch.items]
+        if len(items) > 1:
+            logger.info(f"合并处理 {len(items)} 个请求: {key}")
+        try:
+            results = await flush(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"合并处理返回了{len(results)}个结果，应为{len(items)}个")
+        except asyncio.CancelledError:
+            for _, future in batch.items:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch.items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch.items, results):
+            if not future.done():
+                future.set_result(result)
+
+
+draw_coalescer: Coalescer = Coalescer()
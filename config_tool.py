@@ -0,0 +1,91 @@
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import toml
+import tomlkit
+
+from .deck_tool import FileSignature, file_signature
+from .file_tool import DebouncedSave, atomic_write_text
+
+logger = logging.getLogger("tarots_config_tool")
+
+# 合并多次修改后再落盘的等待时间（秒）
+WRITE_DELAY = 0.5
+
+_MISSING = object()
+
+
+class ConfigStore:
+    """
+    config.toml 的进程级快照。
+    - 读取：按文件修改时间和大小判断是否需要重新解析，手动修改配置文件会即时生效（热重载）
+    - 写入：修改先进入内存中的待写队列并立即对读取可见，短暂延迟合并后用tomlkit
+      保留注释和格式，通过临时文件+rename原子落盘；值未变化时不产生任何写入
+    """
+
+    def __init__(self, path: Path, write_delay: float = WRITE_DELAY):
+        self.path = path
+        self.write_delay = write_delay
+        self._lock = threading.RLock()
+        self._signature: Optional[FileSignature] = None
+        self._data: Dict[str, Any] = {}
+        self._pending: Dict[Tuple[str, str], Any] = {}
+        self._flusher = DebouncedSave(self.flush, write_delay)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取当前配置（包含尚未落盘的修改），返回值应视为只读
+        :return: 解析后的配置字典
+        """
+        with self._lock:
+            signature = file_signature(self.path)
+            if signature is None:
+                raise FileNotFoundError(f"配置文件不存在: {self.path}")
+            if signature != self._signature:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = toml.load(f)
+                self._signature = signature
+            if not self._pending:
+                return self._data
+            merged = {section: dict(values) if isinstance(values, dict) else values
+                      for section, values in self._data.items()}
+            for (section, key), value in self._pending.items():
+                merged.setdefault(section, {})[key] = value
+            return merged
+
+    def set_value(self, section: str, key: str, value: Any) -> bool:
+        """
+        修改配置项，值与当前配置相同时直接忽略
+        :return: 是否产生了修改
+        """
+        with self._lock:
+            if self.snapshot().get(section, {}).get(key, _MISSING) == value:
+                return False
+            self._pending[(section, key)] = value
+            self._flusher.schedule()
+            return True
+
+    def flush(self):
+        """把待写队列合并写入config.toml"""
+        with self._lock:
+            self._flusher.cancel()
+            if not self._pending:
+                return
+            try:
+                # 落盘时重新读取文件，保留期间被手动修改的其他配置项
+                with open(self.path, "r", encoding="utf-8") as f:
+                    document = tomlkit.load(f)
+                for (section, key), value in self._pending.items():
+                    document.setdefault(section, {})[key] = value
+                atomic_write_text(self.path, tomlkit.dumps(document))
+            except Exception as e:
+                logger.error(f"写入配置文件失败: {e}")
+                return
+            self._pending.clear()
+            # 下次读取时重新解析，顺带吸收期间的外部修改
+            self._signature = None
+
+
+config_store = ConfigStore(Path(__file__).parent.absolute() / "config.toml")
@@ -0,0 +1,193 @@
+import json
+import logging
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .pack_tool import PACK_NAME, DeckPack, EntryKey
+
+logger = logging.getLogger("tarots_deck_tool")
+
+# 文件签名：(修改时间纳秒, 文件大小)，任一变化即视为文件已更新
+FileSignature = Tuple[int, int]
+
+
+def file_signature(path: Path) -> Optional[FileSignature]:
+    """
+    获取文件签名，文件不存在时返回None
+    :param path: 文件路径
+    :return: (st_mtime_ns, st_size) 或 None
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def freeze(data: Any) -> Any:
+    """把解析出的JSON递归转换为只读视图（dict→MappingProxyType，list→tuple）"""
+    if isinstance(data, dict):
+        return MappingProxyType({key: freeze(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return tuple(freeze(item) for item in data)
+    return data
+
+
+class DeckRegistry:
+    """
+    进程级牌组注册表。
+    所有 TarotsAction / TarotsCommand 实例共享同一份只读的牌组和牌阵数据，
+    只有当对应JSON文件的修改时间或大小变化时才会重新解析。
+    牌组目录下存在牌组包（deck.tarotpack）时优先使用包内的牌组数据、牌阵配置和图片；
+    散装的 tarots.json / formation.json 或卡牌原图比牌组包新（打包后又修改或重新下载过）时改用散装文件，并提示重新打包。
+    """
+
+    def __init__(self, jsons_dir: Path):
+        self.jsons_dir = jsons_dir
+        self.formation_path = jsons_dir / "formation.json"
+        self._lock = threading.RLock()
+        self._decks: Dict[str, Tuple[FileSignature, Mapping]] = {}
+        self._formations: Optional[Tuple[FileSignature, Mapping]] = None
+        self._packs: Dict[str, Tuple[FileSignature, DeckPack, Mapping, Mapping]] = {}
+        self._stale_warned: Dict[Tuple[str, Path], Tuple[FileSignature, FileSignature]] = {}
+
+    def deck_path(self, deck_name: str) -> Path:
+        """牌组数据文件路径"""
+        return self.jsons_dir / deck_name / "tarots.json"
+
+    def pack_path(self, deck_name: str) -> Path:
+        """牌组包文件路径"""
+        return self.jsons_dir / deck_name / PACK_NAME
+
+    def get_pack(self, deck_name: str) -> Optional[DeckPack]:
+        """
+        获取牌组包（只读内存映射），文件变化时自动重新映射
+        :return: 牌组包，不存在或损坏时返回None
+        """
+        entry = self._get_pack_entry(deck_name)
+        return entry[1] if entry else None
+
+    def get_image_pack(self, deck_name: str, key: EntryKey, source_path: Path) -> Optional[DeckPack]:
+        """
+        获取可读取某张图片的牌组包
+        :param key: 图片的索引键 (卡牌ID, 正逆位, 变体)
+        :param source_path: 该牌的散装正位原图，打包后被重新下载过时包内该牌的所有图片（含派生图片）都已过期
+        :return: 牌组包，未打包、包内没有该图片或散装原图比牌组包新时返回None
+        """
+        entry = self._get_pack_entry(deck_name)
+        if entry is None or key not in entry[1] or self._newer_than_pack(deck_name, source_path, entry[0]):
+            return None
+        return entry[1]
+
+    def _get_pack_entry(self, deck_name: str) -> Optional[Tuple[FileSignature, DeckPack, Mapping, Mapping]]:
+        if not deck_name:
+            return None
+        path = self.pack_path(deck_name)
+        with self._lock:
+            signature = file_signature(path)
+            cached = self._packs.get(deck_name)
+            if cached and cached[0] == signature:
+                return cached
+            self._close_pack(deck_name)
+            if signature is None:
+                return None
+            try:
+                pack = DeckPack(path)
+            except Exception as e:
+                logger.error(f"牌组包加载失败，改用散装文件: {path} - {e}")
+                return None
+            entry = (signature, pack, freeze(pack.deck), freeze(pack.formations))
+            self._packs[deck_name] = entry
+            logger.info(f"已映射牌组包 {deck_name}: {len(pack)}张图片")
+            return entry
+
+    def _newer_than_pack(self, deck_name: str, path: Path, pack_signature: FileSignature) -> bool:
+        """散装文件是否在打包之后被修改过；是则提示重新打包（同一对文件只提示一次）"""
+        signature = file_signature(path)
+        if signature is None or signature[0] <= pack_signature[0]:
+            return False
+        with self._lock:
+            if self._stale_warned.get((deck_name, path)) != (signature, pack_signature):
+                self._stale_warned[(deck_name, path)] = (signature, pack_signature)
+                logger.warning(
+                    f"{path.name} 比 {deck_name} 牌组包新，已改用散装文件；请使用 /tarots pack 重新打包"
+                )
+        return True
+
+    def _close_pack(self, deck_name: str):
+        cached = self._packs.pop(deck_name, None)
+        if cached:
+            cached[1].close()
+
+    def available_decks(self) -> List[str]:
+        """扫描tarot_jsons文件夹，返回可用牌组列表（只做stat，不解析JSON）"""
+        if not self.jsons_dir.exists():
+            logger.warning(f"tarot_jsons目录不存在: {self.jsons_dir}")
+            return []
+        return sorted(
+            item.name for item in self.jsons_dir.iterdir()
+            if item.is_dir() and ((item / "tarots.json").exists() or (item / PACK_NAME).exists())
+        )
+
+    def get_deck(self, deck_name: str) -> Optional[Mapping]:
+        """
+        获取牌组的只读视图，文件变化时自动重载
+        :param deck_name: 牌组名称（tarot_jsons下的文件夹名）
+        :return: 牌组数据，牌组不存在时返回None
+        """
+        if not deck_name:
+            return None
+        path = self.deck_path(deck_name)
+        packed = self._get_pack_entry(deck_name)
+        if packed and not self._newer_than_pack(deck_name, path, packed[0]):
+            return packed[2]
+        with self._lock:
+            signature = file_signature(path)
+            if signature is None:
+                self._decks.pop(deck_name, None)
+                return None
+            cached = self._decks.get(deck_name)
+            if cached and cached[0] == signature:
+                return cached[1]
+            deck = self._parse(path)
+            self._decks[deck_name] = (signature, deck)
+            logger.info(f"已加载牌组 {deck_name}: {deck.get('_meta', {}).get('total_cards', '?')}张卡牌")
+            return deck
+
+    def get_formations(self, deck_name: Optional[str] = None) -> Mapping:
+        """获取牌阵配置的只读视图，文件变化时自动重载；指定的牌组已打包时使用包内的牌阵配置"""
+        packed = self._get_pack_entry(deck_name) if deck_name else None
+        if packed and packed[3] and not self._newer_than_pack(deck_name, self.formation_path, packed[0]):
+            return packed[3]
+        with self._lock:
+            signature = file_signature(self.formation_path)
+            if signature is None:
+                raise FileNotFoundError(f"牌阵配置文件不存在: {self.formation_path}")
+            if self._formations and self._formations[0] == signature:
+                return self._formations[1]
+            formations = self._parse(self.formation_path)
+            self._formations = (signature, formations)
+            logger.info(f"已加载{len(formations)}种抽牌方式")
+            return formations
+
+    def invalidate(self, deck_name: Optional[str] = None):
+        """丢弃缓存，下次访问时强制重新解析；不传牌组名则清空全部"""
+        with self._lock:
+            if deck_name is None:
+                self._decks.clear()
+                self._formations = None
+                for name in list(self._packs):
+                    self._close_pack(name)
+            else:
+                self._decks.pop(deck_name, None)
+                self._close_pack(deck_name)
+
+    @staticmethod
+    def _parse(path: Path) -> Mapping:
+        with open(path, encoding="utf-8") as f:
+            return freeze(json.load(f))
+
+
+deck_registry = DeckRegistry(Path(__file__).parent.absolute() / "tarot_jsons")
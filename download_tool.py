@@ -1,16 +1,317 @@
 import aiohttp
 import asyncio
+import hashlib
 import os
+import re
 from pathlib import Path
-from typing import Optional
-from PIL import Image
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
 import logging
+from contextlib import asynccontextmanager
+
+from .file_tool import discard_file
+from .image_tool import validate_image_integrity
+from .worker_tool import worker_pool
 
 logger = logging.getLogger("tarots_download_tool")
 
+
+class SingleFlight:
+    """
+    进程内的单飞（single-flight）表：同一个键的并发调用只真正执行一次，
+    其余调用者等待并共享同一个结果。某个调用者被取消不会中断共享的执行。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        :param key: 去重键，例如 (牌组, 卡牌ID)
+        :param factory: 没有进行中的调用时用于发起执行的协程工厂
+        :return: 共享的执行结果
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done, key=key: self._release(key, done))
+        return await asyncio.shield(future)
+
+    def _release(self, key: Hashable, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+
+download_flights = SingleFlight()
+
+
+class HttpClient:
+    """
+    插件生命周期内共享的HTTP客户端。
+    所有下载复用同一个带连接池的会话：保持长连接、缓存DNS解析、限制总连接数和单主机连接数，
+    避免每张图片、每次重试都重新进行TCP和TLS握手。
+    """
+
+    def __init__(self, limit: int = 16, limit_per_host: int = 8, ttl_dns_cache: int = 300, keepalive_timeout: int = 30):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.ttl_dns_cache = ttl_dns_cache
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 会话 -> 正在使用它的请求数；被替换下来的旧会话等到计数归零才关闭
+        self._leases: Dict[aiohttp.ClientSession, int] = {}
+
+    def configure(self, limit: Optional[int] = None, limit_per_host: Optional[int] = None):
+        """调整连接池上限，变化后新请求使用新的连接池，进行中的请求继续使用旧连接池直到完成"""
+        if limit is not None and limit != self.limit:
+            self.limit = limit
+            self._retire()
+        if limit_per_host is not None and limit_per_host != self.limit_per_host:
+            self.limit_per_host = limit_per_host
+            self._retire()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """
+        借用共享会话发起请求，块内的请求完成前该会话不会因配置变化被关闭
+        """
+        session = await self.get_session()
+        self._leases[session] = self._leases.get(session, 0) + 1
+        try:
+            yield session
+        finally:
+            remaining = self._leases[session] - 1
+            if remaining:
+                self._leases[session] = remaining
+            else:
+                del self._leases[session]
+                if session is not self._session:
+                    self._close_later(session)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        获取共享会话，不存在、已关闭或属于其他事件循环时重新创建。
+        发起请求时应使用 session()，否则配置变化时进行中的请求可能被中断
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._retire()
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.ttl_dns_cache,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._loop = loop
+        return self._session
+
+    def _retire(self):
+        """停止向新请求分配当前会话；没有请求在使用时立即在后台关闭，否则等最后一个请求结束后关闭"""
+        session, self._session = self._session, None
+        if session is not None and session not in self._leases:
+            self._close_later(session)
+
+    @staticmethod
+    def _close_later(session: aiohttp.ClientSession):
+        if session.closed:
+            return
+        try:
+            asyncio.get_running_loop().create_task(session.close())
+        except RuntimeError:
+            pass
+
+    async def close(self):
+        """关闭共享会话（插件卸载或麦麦关闭时调用）"""
+        session, self._session = self._session, None
+        self._loop = None
+        sessions = set(self._leases)
+        self._leases.clear()
+        if session is not None:
+            sessions.add(session)
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+        if sessions:
+            logger.info("[图片下载] 已关闭共享HTTP连接池")
+
+
+http_client = HttpClient()
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DownloadError(Exception):
+    """响应异常或下载内容不完整"""
+
+
+class DownloadResult(NamedTuple):
+    """一次完整下载的结果"""
+    path: Path                    # 已写完的部分文件，校验通过后交给 finish_download
+    sha256: str                   # 边下边算的内容哈希
+    etag: Optional[str]           # 服务器返回的ETag，用于之后的条件请求
+    last_modified: Optional[str]  # 服务器返回的Last-Modified
+
+
+def partial_path(save_path: Path) -> Path:
+    """下载中的部分文件路径（与目标文件同目录，可用于断点续传）"""
+    return save_path.with_name(f".{save_path.name}.part")
+
+
+def _validator_path(part_path: Path) -> Path:
+    """记录部分文件对应资源版本（ETag / Last-Modified）的伴随文件"""
+    return part_path.with_name(part_path.name + ".validator")
+
+
+def discard_partial(save_path: Path):
+    """丢弃目标文件对应的部分文件"""
+    part_path = partial_path(save_path)
+    discard_file(part_path)
+    discard_file(_validator_path(part_path))
+
+
+def _load_partial(part_path: Path) -> Tuple[int, Any, Optional[str]]:
+    """读取已下载的部分：返回 (已有字节数, 已累计的哈希对象, 资源版本)，无法续传时字节数为0"""
+    hasher = hashlib.sha256()
+    try:
+        validator = _validator_path(part_path).read_text(encoding="utf-8").strip() or None
+    except OSError:
+        validator = None
+    if validator is None:
+        return 0, hasher, None
+    offset = 0
+    try:
+        with open(part_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(chunk)
+                offset += len(chunk)
+    except OSError:
+        return 0, hashlib.sha256(), None
+    return offset, hasher, validator
+
+
+def _write_validator(part_path: Path, validator: Optional[str]):
+    if validator:
+        _validator_path(part_path).write_text(validator, encoding="utf-8")
+    else:
+        discard_file(_validator_path(part_path))
+
+
+def _close_synced(f):
+    try:
+        f.flush()
+        os.fsync(f.fileno())
+    finally:
+        f.close()
+
+
+def _resume_validator(headers) -> Optional[str]:
+    """可用于 If-Range 的资源版本，弱ETag不能用于范围请求"""
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _content_range_total(content_range: Optional[str], offset: int) -> Optional[int]:
+    """解析 Content-Range: bytes start-end/total，起始位置与请求不符时抛出 DownloadError"""
+    match = re.fullmatch(r"bytes (\d+)-(\d+)/(\d+|\*)", (content_range or "").strip())
+    if not match or int(match.group(1)) != offset:
+        raise DownloadError(f"续传范围不符: {content_range}")
+    return None if match.group(3) == "*" else int(match.group(3))
+
+
+async def stream_download(
+    session: aiohttp.ClientSession,
+    url: str,
+    save_path: Path,
+    proxy: Optional[str] = None,
+    timeout: float = 15,
+    chunk_size: int = CHUNK_SIZE,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+) -> Optional[DownloadResult]:
+    """
+    分块流式下载到目标文件同目录的部分文件，边写边计算sha256并核对Content-Length。
+    上次中断留下的部分文件会用 Range + If-Range 续传，服务器不支持或资源已变化时从头下载。
+    完成后由调用方校验内容，再调用 finish_download 原子替换目标文件。
+    :param session: HTTP会话
+    :param url: 图片直链
+    :param save_path: 最终保存路径
+    :param proxy: 可选，http代理
+    :param timeout: 整个请求的超时（秒）
+    :param chunk_size: 每次读取的块大小
+    :param etag: 本地副本的ETag，传入时发起条件请求（If-None-Match）
+    :param last_modified: 本地副本的Last-Modified，传入时发起条件请求（If-Modified-Since）
+    :return: 下载结果；条件请求得到304（上游未变化）时返回None
+    :raises DownloadError: 状态码异常或收到的长度与声明不符（部分文件会保留用于续传）
+    """
+    part_path = partial_path(save_path)
+    offset, hasher, validator = await worker_pool.run_io(_load_partial, part_path)
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+    else:
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    req_kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout), "headers": headers}
+    if proxy:
+        req_kwargs["proxy"] = proxy
+
+    async with session.get(url, **req_kwargs) as resp:
+        if resp.status == 304 and not offset:
+            return None
+        if resp.status == 206 and offset:
+            total = _content_range_total(resp.headers.get("Content-Range"), offset)
+            mode = "ab"
+            logger.info(f"[图片下载] 从第{offset}字节续传 {save_path.name}")
+        elif resp.status == 200:
+            # 全新下载（或服务器忽略了Range / 资源已变化），重新开始计算
+            offset, hasher, mode = 0, hashlib.sha256(), "wb"
+            # 传输层压缩会被自动解压，此时Content-Length不是文件长度
+            encoded = resp.headers.get("Content-Encoding", "identity") != "identity"
+            total = None if encoded else resp.content_length
+            await worker_pool.run_io(_write_validator, part_path, _resume_validator(resp.headers))
+        elif resp.status == 416:
+            discard_partial(save_path)
+            raise DownloadError("续传范围无效，已丢弃部分文件")
+        else:
+            raise DownloadError(f"异常状态码 {resp.status}")
+
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+        f = await worker_pool.run_io(open, part_path, mode)
+        received = offset
+        try:
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                hasher.update(chunk)
+                await worker_pool.run_io(f.write, chunk)
+                received += len(chunk)
+        finally:
+            await worker_pool.run_io(_close_synced, f)
+
+    if total is not None and received != total:
+        if received > total:
+            discard_partial(save_path)
+        raise DownloadError(f"长度不符：收到{received}字节，应为{total}字节")
+    return DownloadResult(part_path, hasher.hexdigest(), resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+
+
+def finish_download(part_path: Path, save_path: Path):
+    """校验通过后把部分文件原子替换为目标文件"""
+    os.replace(part_path, save_path)
+    discard_file(_validator_path(part_path))
+
 async def download_image(url: str, save_path: Path, proxy: Optional[str] = None, max_retries: int = 3, retry_delay: int = 2) -> bool:
     """
-    下载图片到指定路径，支持重试和完整性校验。
+    下载图片到指定路径，支持重试和完整性校验。同一路径的并发下载会合并为一次。
     :param url: 图片直链
     :param save_path: 保存路径（Path对象）
     :param proxy: 可选，http代理
@@ -18,52 +319,31 @@ async def download_image(url: str, save_path: Path, proxy: Optional[str] = None,
     :param retry_delay: 重试间隔（秒）
     :return: 下载并校验成功返回True，否则False
     """
+    return await download_flights.run(
+        ("path", str(save_path)),
+        lambda: _download_image(url, save_path, proxy, max_retries, retry_delay),
+    )
+
+
+async def _download_image(url: str, save_path: Path, proxy: Optional[str], max_retries: int, retry_delay: int) -> bool:
     for attempt in range(1, max_retries + 1):
         try:
             logger.info(f"[图片下载] 尝试 {attempt}/{max_retries} - {url}")
-            async with aiohttp.ClientSession() as session:
-                req_kwargs = {"timeout": 15}
-                if proxy:
-                    req_kwargs["proxy"] = proxy
-                async with session.get(url, **req_kwargs) as resp:
-                    if resp.status == 200:
-                        save_path.parent.mkdir(parents=True, exist_ok=True)
-                        with open(save_path, "wb") as f:
-                            f.write(await resp.read())
-                        if validate_image_integrity(save_path):
-                            logger.info(f"[图片下载] 成功并通过完整性检测 {save_path.name} (尝试 {attempt}次)")
-                            return True
-                        else:
-                            logger.warning(f"[图片下载] 完整性检测失败，删除文件: {save_path}")
-                            try:
-                                save_path.unlink()
-                            except Exception as delete_error:
-                                logger.error(f"[图片下载] 删除损坏文件失败: {delete_error}")
-                    else:
-                        logger.warning(f"[图片下载] 异常状态码 {resp.status} - {url}")
+            # 流式写入部分文件，校验通过后再原子替换，目标路径上永远不会出现写了一半的文件
+            async with http_client.session() as session:
+                result = await stream_download(session, url, save_path, proxy)
+            if await worker_pool.run_cpu(validate_image_integrity, result.path):
+                finish_download(result.path, save_path)
+                logger.info(f"[图片下载] 成功并通过完整性检测 {save_path.name} (尝试 {attempt}次)")
+                return True
+            else:
+                logger.warning(f"[图片下载] 完整性检测失败，丢弃文件: {save_path}")
+                discard_partial(save_path)
+        except DownloadError as e:
+            logger.warning(f"[图片下载] 尝试 {attempt}/{max_retries} 失败: {str(e)} - {url}")
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.warning(f"[图片下载] 尝试 {attempt}/{max_retries} 失败: {str(e)}")
         if attempt < max_retries:
             await asyncio.sleep(retry_delay ** attempt)
     logger.error(f"[图片下载] 终极失败 {url}，已达最大重试次数 {max_retries}")
     return False
-
-def validate_image_integrity(file_path: Path) -> bool:
-    """
-    检查图片文件完整性
-    :param file_path: 图片文件路径
-    :return: 完整返回True，否则False
-    """
-    try:
-        if not file_path.exists() or file_path.stat().st_size == 0:
-            return False
-        try:
-            with Image.open(file_path) as img:
-                if img.size[0] <= 0 or img.size[1] <= 0:
-                    return False
-                img.load()
-                return True
-        except Exception:
-            return False
-    except Exception:
-        return False
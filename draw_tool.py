@@ -0,0 +1,198 @@
+import logging
+import math
+import random
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖，没有时退回标准库实现
+    np = None
+
+logger = logging.getLogger("tarots_draw_tool")
+
+# 抽牌范围对应的卡牌编号（整数），牌组中卡牌ID为编号的字符串形式
+CARD_RANGES: Dict[str, Tuple[int, ...]] = {
+    "全部": tuple(range(78)),
+    "大阿卡纳": tuple(range(22)),
+    "小阿卡纳": tuple(range(22, 78)),
+}
+# 批量抽牌时每块处理的抽牌次数，限制中间数组的内存占用
+CHUNK_SIZE = 1 << 16
+# 模拟统计允许的最大抽牌次数（没有NumPy时使用更低的上限）
+SIMULATE_LIMIT = 10_000_000
+PURE_PYTHON_SIMULATE_LIMIT = 200_000
+
+_INDEX_ARRAYS: Dict[str, "np.ndarray"] = {}
+
+
+def has_numpy() -> bool:
+    return np is not None
+
+
+def card_indices(card_type: str) -> Tuple[int, ...]:
+    """抽牌范围内的卡牌编号，未知范围按全部处理"""
+    return CARD_RANGES.get(card_type, CARD_RANGES["全部"])
+
+
+def new_seed() -> int:
+    """生成一个新的随机种子，记录下来即可复现这次抽牌"""
+    return secrets.randbits(63)
+
+
+def _index_array(card_type: str) -> "np.ndarray":
+    array = _INDEX_ARRAYS.get(card_type)
+    if array is None:
+        array = _INDEX_ARRAYS[card_type] = np.asarray(card_indices(card_type), dtype=np.int16)
+    return array
+
+
+def draw_batch(
+    card_type: str,
+    count: int,
+    batch: int,
+    allow_reverse: bool,
+    seed: Any = None,
+) -> Tuple[Sequence, Sequence]:
+    """
+    一次生成 batch 次抽牌，每次从抽牌范围内不放回地抽 count 张
+    :param allow_reverse: 是否切牌（每张牌各有50%概率逆位），否则全部正位
+    :param seed: 随机种子（整数，有NumPy时也可以是 Generator），相同参数和种子得到相同的结果；
+                 有无NumPy使用的随机数引擎不同，种子只在同一引擎下可复现
+    :return: (卡牌编号, 是否逆位)，有NumPy时为 batch×count 的数组，否则为嵌套列表
+    """
+    indices = _checked_indices(card_type, count)
+    if np is None:
+        return _draw_batch_python(indices, count, batch, allow_reverse, random.Random(seed))
+
+    rng = np.random.default_rng(seed)
+    rows = np.arange(batch)
+    deck = np.tile(_index_array(card_type), (batch, 1))
+    # 逐列进行的部分Fisher-Yates洗牌：只需要前 count 个位置，每一步对所有行同时交换
+    for position in range(count):
+        picks = rng.integers(position, len(indices), size=batch)
+        chosen = deck[rows, picks]
+        deck[rows, picks] = deck[:, position]
+        deck[:, position] = chosen
+    ids = deck[:, :count]
+    if allow_reverse:
+        reversed_flags = rng.random((batch, count)) < 0.5
+    else:
+        reversed_flags = np.zeros((batch, count), dtype=bool)
+    return ids, reversed_flags
+
+
+def _checked_indices(card_type: str, count: int) -> Tuple[int, ...]:
+    indices = card_indices(card_type)
+    if not 0 < count <= len(indices):
+        raise ValueError(f"抽牌数 {count} 超出范围，{card_type}共{len(indices)}张")
+    return indices
+
+
+def _draw_batch_python(
+    indices: Tuple[int, ...], count: int, batch: int, allow_reverse: bool, rng: random.Random
+) -> Tuple[List[List[int]], List[List[bool]]]:
+    ids, reversed_flags = [], []
+    for _ in range(batch):
+        ids.append(rng.sample(indices, count))
+        reversed_flags.append([rng.random() < 0.5 if allow_reverse else False for _ in range(count)])
+    return ids, reversed_flags
+
+
+def draw_reading(card_type: str, count: int, allow_reverse: bool, seed: Optional[int] = None) -> List[Tuple[str, bool]]:
+    """
+    抽一次牌。总是使用标准库的随机数生成器，同一种子的结果与是否安装NumPy无关
+    （每日一抽依赖这一点保证同一用户当天抽到的牌不变）
+    :return: 按牌阵位置排列的 (卡牌ID, 是否逆位)
+    """
+    indices = _checked_indices(card_type, count)
+    ids, reversed_flags = _draw_batch_python(indices, count, 1, allow_reverse, random.Random(seed))
+    return [(str(card_id), is_reverse) for card_id, is_reverse in zip(ids[0], reversed_flags[0])]
+
+
+@dataclass
+class SimulationResult:
+    card_type: str
+    count: int
+    draws: int
+    seconds: float
+    engine: str
+    card_counts: Dict[int, int]
+    reversed_total: int
+    chi_square: float
+    p_value: float
+
+    @property
+    def dof(self) -> int:
+        return len(self.card_counts) - 1
+
+    def extremes(self) -> Tuple[Tuple[int, float], Tuple[int, float]]:
+        """出现最少和最多的卡牌及其相对期望值的偏差"""
+        expected = self.draws * self.count / len(self.card_counts)
+        ordered = sorted(self.card_counts.items(), key=lambda item: item[1])
+        low, high = ordered[0], ordered[-1]
+        return (low[0], low[1] / expected - 1), (high[0], high[1] / expected - 1)
+
+
+def simulate(
+    card_type: str,
+    count: int,
+    draws: int,
+    allow_reverse: bool = True,
+    seed: Optional[int] = None,
+) -> SimulationResult:
+    """
+    模拟大量抽牌，统计每张牌出现的次数和逆位比例，并对卡牌频数做卡方均匀性检验。
+    有NumPy时使用NumPy的随机数引擎，种子只在同一引擎下可复现
+    （阻塞执行，异步代码中应通过 worker_pool.run_cpu 放到CPU工作进程调用）
+    """
+    indices = card_indices(card_type)
+    started = time.perf_counter()
+    draws = max(1, min(draws, SIMULATE_LIMIT))
+    if np is None:
+        draws = min(draws, PURE_PYTHON_SIMULATE_LIMIT)
+        ids, reversed_flags = _draw_batch_python(indices, count, draws, allow_reverse, random.Random(seed))
+        counts = {index: 0 for index in indices}
+        reversed_total = 0
+        for row_ids, row_flags in zip(ids, reversed_flags):
+            for card_id in row_ids:
+                counts[card_id] += 1
+            reversed_total += sum(row_flags)
+        engine = "Python"
+    else:
+        # 分块抽牌以控制中间数组的内存，每块使用由主种子派生的独立随机流，同一种子结果不变
+        seeds = np.random.SeedSequence(seed).spawn(math.ceil(draws / CHUNK_SIZE))
+        totals = np.zeros(max(indices) + 1, dtype=np.int64)
+        reversed_total = 0
+        for chunk, chunk_seed in enumerate(seeds):
+            size = min(CHUNK_SIZE, draws - chunk * CHUNK_SIZE)
+            ids, reversed_flags = draw_batch(card_type, count, size, allow_reverse, np.random.default_rng(chunk_seed))
+            totals += np.bincount(ids.ravel(), minlength=len(totals))
+            reversed_total += int(reversed_flags.sum())
+        counts = {index: int(totals[index]) for index in indices}
+        engine = "NumPy"
+
+    expected = draws * count / len(indices)
+    chi_square = sum((observed - expected) ** 2 / expected for observed in counts.values())
+    logger.info(f"模拟抽牌 {draws} 次（{engine}）用时 {time.perf_counter() - started:.2f}s，卡方 {chi_square:.1f}")
+    return SimulationResult(
+        card_type=card_type,
+        count=count,
+        draws=draws,
+        seconds=time.perf_counter() - started,
+        engine=engine,
+        card_counts=counts,
+        reversed_total=reversed_total,
+        chi_square=chi_square,
+        p_value=chi_square_p_value(chi_square, len(indices) - 1),
+    )
+
+
+def chi_square_p_value(statistic: float, dof: int) -> float:
+    """卡方分布上尾概率的Wilson-Hilferty近似，自由度较大时足够准确，不依赖SciPy"""
+    if dof <= 0:
+        return 1.0
+    z = ((statistic / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+    return 0.5 * math.erfc(z / math.sqrt(2))
@@ -0,0 +1,131 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("tarots_file_tool")
+
+
+def write_temp_file(path: Path, data: bytes) -> Path:
+    """
+    把内容写入目标文件同目录下的临时文件并fsync，之后可用 os.replace 原子替换目标文件
+    :param path: 目标文件路径
+    :param data: 文件内容
+    :return: 临时文件路径
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        discard_file(Path(tmp_name))
+        raise
+    return Path(tmp_name)
+
+
+def discard_file(path: Path):
+    """删除文件，文件不存在或删除失败时忽略"""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def atomic_write_bytes(path: Path, data: bytes):
+    """
+    原子写入文件：先写入同目录的临时文件，fsync后再rename覆盖目标文件，
+    任何时刻读取者看到的都只会是旧文件或完整的新文件。
+    :param path: 目标文件路径
+    :param data: 文件内容
+    """
+    tmp_path = write_temp_file(path, data)
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        discard_file(tmp_path)
+        raise
+
+
+def atomic_write_text(path: Path, text: str, encoding: str = "utf-8"):
+    """原子写入文本文件，见 atomic_write_bytes"""
+    atomic_write_bytes(path, text.encode(encoding))
+
+
+def load_json(path: Path, default: Any, description: str) -> Any:
+    """
+    读取JSON文件，文件不存在或损坏时返回 default（损坏时记录警告）
+    :param description: 日志中对该文件的称呼
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"{description}损坏，将重新建立: {path} - {e}")
+    return default
+
+
+def save_json(path: Path, data: Any, description: str) -> bool:
+    """
+    把数据原子写入JSON文件，失败时记录错误
+    :param description: 日志中对该文件的称呼
+    :return: 是否写入成功
+    """
+    try:
+        atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=1))
+    except Exception as e:
+        logger.error(f"写入{description}失败: {path} - {e}")
+        return False
+    return True
+
+
+class DebouncedSave:
+    """
+    合并短时间内的多次修改后再保存一次：
+    在事件循环中调用 schedule() 时延迟 delay 秒执行保存函数，期间的再次调用不会重复安排；
+    不在事件循环中（例如同步调用）时立即保存。保存函数开头应调用 cancel()，以便手动保存时取消待执行的定时器
+    """
+
+    def __init__(self, save: Callable[[], None], delay: float):
+        self.save = save
+        self.delay = delay
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def pending(self) -> bool:
+        """是否有尚未执行的保存"""
+        return self._handle is not None
+
+    def schedule(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        if self._handle is None:
+            self._handle = loop.call_later(self.delay, self.save)
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+
+def read_bytes(path: Path) -> bytes:
+    """读取整个文件"""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def read_base64(path: Path) -> str:
+    """读取文件并编码为base64字符串（发送图片用）"""
+    return base64.b64encode(read_bytes(path)).decode("utf-8")
@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .file_tool import DebouncedSave, load_json, save_json
+
+logger = logging.getLogger("tarots_fortune_tool")
+
+DAILY_FORMATION = "每日一抽"
+# 每日一抽固定为一张可逆位的牌
+DAILY_SPREAD: Dict[str, Any] = {
+    "cards_num": 1,
+    "is_cut": True,
+    "represent": [["今日运势"]],
+    "layout": [[0, 0]],
+}
+# 合并多次改动后再写入文件的等待时间（秒）
+SAVE_DELAY = 5.0
+
+
+def fortune_day(now: Optional[datetime] = None) -> date:
+    """每日一抽所属的日期（本地时间）"""
+    return (now or datetime.now()).date()
+
+
+def fortune_seed(user_key: str, day: date, deck_name: str) -> int:
+    """由 (用户, 日期, 牌组) 确定的抽牌种子，同一用户同一天在同一牌组总是抽到同一张牌"""
+    digest = hashlib.sha256(f"{user_key}|{day.isoformat()}|{deck_name}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def seconds_until(hour: int, now: Optional[datetime] = None) -> float:
+    """距离下一个本地时间 hour 点整的秒数"""
+    now = now or datetime.now()
+    target = now.replace(hour=hour % 24, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class FortuneStore:
+    """
+    每日一抽的持久化状态：
+    - 最近使用过每日一抽的用户及其所在聊天，供凌晨的预计算任务确定要准备哪些人的牌
+    - 当天已生成（或预先生成）的解牌，同一用户当天再次抽取时直接复用，日期变化后自动清空
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._saver = DebouncedSave(self.save, SAVE_DELAY)
+
+    def touch(self, user_key: str, day: date, chat_id: Optional[str]):
+        """记录用户在某天使用了每日一抽"""
+        with self._lock:
+            users = self._get_data()["users"]
+            users[user_key] = {"last_seen": day.isoformat(), "chat_id": chat_id}
+            self._saver.schedule()
+
+    def active_users(self, day: date, active_days: int) -> List[Tuple[str, Optional[str]]]:
+        """
+        最近 active_days 天内使用过每日一抽的用户，更早的用户会被清理
+        :return: (用户标识, 最近所在的聊天ID) 列表
+        """
+        cutoff = (day - timedelta(days=max(1, active_days))).isoformat()
+        with self._lock:
+            users = self._get_data()["users"]
+            expired = [user_key for user_key, info in users.items() if info.get("last_seen", "") < cutoff]
+            for user_key in expired:
+                del users[user_key]
+            if expired:
+                self._saver.schedule()
+            return [(user_key, info.get("chat_id")) for user_key, info in users.items()]
+
+    def get_reading(self, day: date, user_key: str, deck_name: str) -> Optional[str]:
+        with self._lock:
+            readings = self._readings(day)
+            return readings.get(f"{deck_name}|{user_key}")
+
+    def put_reading(self, day: date, user_key: str, deck_name: str, text: str):
+        if not text:
+            return
+        with self._lock:
+            self._readings(day)[f"{deck_name}|{user_key}"] = text
+            self._saver.schedule()
+
+    def stats(self, day: date) -> Dict[str, int]:
+        with self._lock:
+            return {"users": len(self._get_data()["users"]), "readings": len(self._readings(day))}
+
+    def _readings(self, day: date) -> Dict[str, str]:
+        """当天的解牌表，日期变化时丢弃前一天的"""
+        data = self._get_data()
+        if data["day"] != day.isoformat():
+            data["day"] = day.isoformat()
+            data["readings"] = {}
+        return data["readings"]
+
+    def _get_data(self) -> Dict[str, Any]:
+        if self._data is None:
+            data = load_json(self.path, {}, "每日一抽记录文件")
+            if not isinstance(data, dict):
+                data = {}
+            data.setdefault("users", {})
+            data.setdefault("day", "")
+            data.setdefault("readings", {})
+            self._data = data
+        return self._data
+
+    def save(self):
+        """把记录原子写入缓存目录"""
+        with self._lock:
+            self._saver.cancel()
+            if self._data is not None:
+                save_json(self.path, self._data, "每日一抽记录")
+
+
+fortune_store = FortuneStore(Path(__file__).parent.absolute() / "tarots_cache" / "fortunes.json")
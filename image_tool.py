@@ -0,0 +1,226 @@
+import io
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Sequence, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Pillow 9.1 起旋转常量移到了 Image.Transpose 下
+_ROTATE_180 = getattr(Image, "Transpose", Image).ROTATE_180
+_LANCZOS = getattr(Image, "Resampling", Image).LANCZOS
+
+# 超出字节上限时逐步降低质量和尺寸的下限
+MIN_QUALITY = 40
+MIN_DIMENSION = 256
+
+_FORMAT_SUFFIXES = {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}
+
+# 拼图的背景色和文字颜色
+SPREAD_BACKGROUND = (28, 26, 38)
+SPREAD_LABEL_COLOR = (236, 226, 200)
+
+# 未配置字体时依次尝试的常见中文字体
+CJK_FONT_CANDIDATES = (
+    "C:/Windows/Fonts/msyh.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/wqy-microhei/wqy-microhei.ttc",
+)
+
+
+@dataclass(frozen=True)
+class TransportProfile:
+    """发送用派生图片的规格"""
+    max_dimension: int = 1024  # 长边最大像素
+    image_format: str = "JPEG"  # JPEG / WEBP / PNG
+    quality: int = 85  # 有损格式的初始编码质量
+    max_bytes: int = 0  # 单张图片字节上限，0为不限制
+
+    @property
+    def key(self) -> str:
+        """规格标识，用于派生图片文件名和缓存键"""
+        return f"{self.image_format.lower()}{self.max_dimension}q{self.quality}b{self.max_bytes // 1024}"
+
+    @property
+    def suffix(self) -> str:
+        return _FORMAT_SUFFIXES.get(self.image_format, ".png")
+
+
+def validate_image_integrity(file_path: Path) -> bool:
+    """
+    检查图片文件完整性（完整解码一次）
+    :param file_path: 图片文件路径
+    :return: 完整返回True，否则False
+    """
+    try:
+        if not file_path.exists() or file_path.stat().st_size == 0:
+            return False
+        with Image.open(file_path) as img:
+            if img.size[0] <= 0 or img.size[1] <= 0:
+                return False
+            img.load()
+            return True
+    except Exception:
+        return False
+
+
+def rotate_image_bytes(img_data: bytes, image_format: str = "PNG") -> bytes:
+    """
+    将图片旋转180度生成逆位图片
+    :param img_data: 原图字节
+    :param image_format: 输出编码格式
+    :return: 旋转后的图片字节
+    """
+    with Image.open(io.BytesIO(img_data)) as image:
+        # 180度翻转是无损的像素重排，比 rotate(180) 的仿射变换快
+        rotated_image = image.transpose(_ROTATE_180)
+        buffer = io.BytesIO()
+        rotated_image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def rotate_image_file(src_path: Path) -> bytes:
+    """读取图片文件并旋转180度，返回PNG字节"""
+    with open(src_path, "rb") as f:
+        return rotate_image_bytes(f.read())
+
+
+def _encode(image: Image.Image, profile: TransportProfile, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if profile.image_format == "PNG":
+        image.save(buffer, format="PNG", optimize=True)
+    else:
+        image.save(buffer, format=profile.image_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def render_transport(src_path: Path, profile: TransportProfile, is_reverse: bool = False) -> bytes:
+    """
+    由原图生成发送用的压缩图片
+    :param src_path: 正位原图路径
+    :param profile: 派生图片规格
+    :param is_reverse: 是否生成逆位（旋转180度）
+    :return: 编码后的图片字节
+    """
+    with Image.open(src_path) as source:
+        image = source.copy()
+    if profile.image_format == "JPEG" and image.mode != "RGB":
+        # JPEG不支持透明通道，铺白底
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    image.thumbnail((profile.max_dimension, profile.max_dimension), _LANCZOS)
+    if is_reverse:
+        image = image.transpose(_ROTATE_180)
+
+    quality = profile.quality
+    data = _encode(image, profile, quality)
+    while profile.max_bytes and len(data) > profile.max_bytes:
+        if profile.image_format != "PNG" and quality > MIN_QUALITY:
+            quality = max(MIN_QUALITY, quality - 10)
+        elif max(image.size) > MIN_DIMENSION:
+            image = image.resize(
+                (max(1, int(image.width * 0.85)), max(1, int(image.height * 0.85))), _LANCZOS
+            )
+        else:
+            break
+        data = _encode(image, profile, quality)
+    return data
+
+
+def render_thumbnail(src_path: Path, width: int) -> bytes:
+    """
+    生成拼图用的牌面缩略图
+    :param src_path: 正位原图路径
+    :param width: 缩略图宽度（高度按比例）
+    :return: PNG字节
+    """
+    with Image.open(src_path) as source:
+        image = source.convert("RGBA")
+    height = max(1, round(image.height * width / image.width))
+    image = image.resize((width, height), _LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=8)
+def load_label_font(font_path: str, size: int) -> Tuple[ImageFont.ImageFont, bool]:
+    """
+    加载标签字体，返回 (字体, 是否支持中文)；找不到中文字体时退回PIL内置字体
+    :param font_path: 配置的字体路径，为空时尝试常见中文字体
+    :param size: 字号
+    """
+    for candidate in ((font_path,) if font_path else ()) + CJK_FONT_CANDIDATES:
+        if candidate and Path(candidate).exists():
+            try:
+                return ImageFont.truetype(candidate, size), True
+            except OSError:
+                continue
+    try:
+        # Pillow 10.1 起内置字体支持指定字号
+        return ImageFont.load_default(size=size), False
+    except TypeError:
+        return ImageFont.load_default(), False
+
+
+def compose_spread(
+    cards: Sequence[Tuple[Path, bool]],
+    layout: Sequence[Sequence[float]],
+    labels: Sequence[str],
+    font_path: str = "",
+    image_format: str = "JPEG",
+    quality: int = 85,
+) -> bytes:
+    """
+    把一次占卜抽到的全部牌面按牌阵布局拼成一张图片
+    :param cards: [(缩略图路径, 是否逆位)]，逆位牌会被旋转180度
+    :param layout: 每张牌在网格中的坐标 [x, y]，允许小数（半格错位）
+    :param labels: 每张牌下方的位置标签（例如"1 过去"）
+    :param font_path: 标签字体路径，没有可用中文字体时只标注序号
+    :param image_format: 输出格式
+    :param quality: 有损格式的编码质量
+    :return: 编码后的图片字节
+    """
+    images = []
+    for path, is_reverse in cards:
+        with Image.open(path) as thumb:
+            image = thumb.convert("RGBA")
+        images.append(image.transpose(_ROTATE_180) if is_reverse else image)
+
+    card_w = max(image.width for image in images)
+    card_h = max(image.height for image in images)
+    font, supports_cjk = load_label_font(font_path, max(14, card_w // 11))
+    label_h = max(14, card_w // 11) + 10
+    gap = max(8, card_w // 8)
+    cell_w = card_w + gap
+    cell_h = card_h + label_h + gap
+
+    min_x = min(x for x, _ in layout)
+    min_y = min(y for _, y in layout)
+    width = round((max(x for x, _ in layout) - min_x) * cell_w) + card_w + gap * 2
+    height = round((max(y for _, y in layout) - min_y) * cell_h) + card_h + label_h + gap * 2
+    canvas = Image.new("RGB", (width, height), SPREAD_BACKGROUND)
+    draw = ImageDraw.Draw(canvas)
+
+    for index, (image, (x, y)) in enumerate(zip(images, layout)):
+        left = gap + round((x - min_x) * cell_w)
+        top = gap + round((y - min_y) * cell_h)
+        canvas.paste(image, (left + (card_w - image.width) // 2, top + (card_h - image.height) // 2), image)
+        label = labels[index] if supports_cjk and index < len(labels) else str(index + 1)
+        text_box = draw.textbbox((0, 0), label, font=font)
+        text_left = left + (card_w - (text_box[2] - text_box[0])) // 2
+        draw.text((text_left, top + card_h + 4), label, fill=SPREAD_LABEL_COLOR, font=font)
+
+    buffer = io.BytesIO()
+    if image_format == "PNG":
+        canvas.save(buffer, format="PNG")
+    else:
+        canvas.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
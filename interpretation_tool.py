@@ -0,0 +1,221 @@
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("tarots_interpretation_tool")
+
+# 一条缓存的解牌：(文本, 生成时间戳)
+Variant = Tuple[str, float]
+
+_UNCHANGED = object()
+# 每写入多少条解读清理一次数据库中过期和超出数量上限的记录
+PRUNE_INTERVAL = 100
+
+
+def interpretation_key(
+    deck: str,
+    formation: str,
+    cards: Iterable[Tuple[str, bool]],
+    style_version: str = "",
+) -> str:
+    """
+    解牌缓存键：牌组、牌阵、按位置排列的 (卡牌ID, 是否逆位)、人设/风格版本
+    :return: 可直接用作SQLite主键的字符串
+    """
+    card_part = ",".join(f"{card_id}{'r' if is_reverse else 'n'}" for card_id, is_reverse in cards)
+    return f"{deck}|{formation}|{card_part}|{style_version}"
+
+
+class InterpretationCache:
+    """
+    解牌结果缓存：同一键最多保留 variants 条不同的解读，凑满之前每次仍会请求LLM生成新的解读，
+    凑满后随机返回其中一条，热门组合不再调用LLM而回复仍有变化。
+    内存中按键做LRU淘汰，每条解读超过 ttl 秒后失效；可选用SQLite持久化，重启后仍然有效。
+    """
+
+    def __init__(self, max_entries: int = 2000, ttl: float = 86400, variants: int = 3, db_path: Optional[Path] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.variants = variants
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, List[Variant]]" = OrderedDict()
+        self._db_path: Optional[Path] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._puts_since_prune = 0
+        self.configure(db_path=db_path)
+
+    def configure(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        variants: Optional[int] = None,
+        db_path: Any = _UNCHANGED,
+    ):
+        """调整缓存参数；传入 db_path 时切换持久化数据库，传入None关闭持久化"""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max(1, max_entries)
+            if ttl is not None:
+                self.ttl = ttl
+            if variants is not None:
+                self.variants = max(1, variants)
+            # 同一路径但数据库未打开（已关闭或上次打开失败）时也重新打开
+            if db_path is not _UNCHANGED and (db_path != self._db_path or self._db is None):
+                self._close_db()
+                self._db_path = db_path
+                if db_path is not None:
+                    self._open_db(db_path)
+            self._evict()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        取一条缓存的解读；该键的有效解读少于 variants 条时返回None，由调用方生成新的解读
+        （会阻塞于SQLite读取，异步代码中应放到工作线程调用）
+        """
+        with self._lock:
+            variants = self._load(key)
+            if len(variants) < self.variants:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return random.choice(variants)[0]
+
+    def put(self, key: str, text: str):
+        """登记一条新生成的解读，超出 variants 条时丢弃最旧的"""
+        if not text:
+            return
+        with self._lock:
+            variants = self._load(key)
+            if any(existing == text for existing, _ in variants):
+                return
+            variants.append((text, time.time()))
+            dropped = variants[:-self.variants]
+            del variants[:-self.variants]
+            self._entries[key] = variants
+            self._entries.move_to_end(key)
+            self._evict()
+            if self._db is not None:
+                try:
+                    with self._db:
+                        for old_text, created in dropped:
+                            self._db.execute(
+                                "DELETE FROM interpretations WHERE key = ? AND text = ? AND created = ?",
+                                (key, old_text, created),
+                            )
+                        self._db.execute(
+                            "INSERT INTO interpretations (key, text, created) VALUES (?, ?, ?)",
+                            (key, variants[-1][0], variants[-1][1]),
+                        )
+                except sqlite3.Error as e:
+                    logger.warning(f"写入解牌缓存数据库失败: {e}")
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= PRUNE_INTERVAL:
+                    self._prune_db()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                try:
+                    with self._db:
+                        self._db.execute("DELETE FROM interpretations")
+                except sqlite3.Error as e:
+                    logger.warning(f"清空解牌缓存数据库失败: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "keys": len(self._entries),
+                "variants": sum(len(variants) for variants in self._entries.values()),
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        """关闭持久化数据库（插件卸载时调用），之后需重新 configure(db_path=...) 才会恢复持久化"""
+        with self._lock:
+            self._close_db()
+            self._db_path = None
+
+    def _load(self, key: str) -> List[Variant]:
+        """读取一个键的有效解读（内存未命中时查询数据库），并剔除过期的"""
+        variants = self._entries.get(key)
+        if variants is None:
+            variants = self._query(key)
+            self._entries[key] = variants
+            self._evict()
+        else:
+            self._entries.move_to_end(key)
+        if self.ttl > 0:
+            deadline = time.time() - self.ttl
+            variants[:] = [variant for variant in variants if variant[1] >= deadline]
+        return variants
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _query(self, key: str) -> List[Variant]:
+        if self._db is None:
+            return []
+        try:
+            rows = self._db.execute(
+                "SELECT text, created FROM interpretations WHERE key = ? ORDER BY created", (key,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"读取解牌缓存数据库失败: {e}")
+            return []
+        return [(text, created) for text, created in rows][-self.variants:]
+
+    def _open_db(self, db_path: Path):
+        try:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS interpretations (key TEXT NOT NULL, text TEXT NOT NULL, created REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_interpretations_key ON interpretations (key)")
+        except sqlite3.Error as e:
+            logger.error(f"打开解牌缓存数据库失败，仅使用内存缓存: {db_path} - {e}")
+            self._close_db()
+            return
+        self._prune_db()
+
+    def _prune_db(self):
+        """删除过期的解读，并只保留最近写入的 max_entries 个键，避免长期运行时数据库无限增长"""
+        self._puts_since_prune = 0
+        if self._db is None:
+            return
+        try:
+            with self._db:
+                if self.ttl > 0:
+                    self._db.execute("DELETE FROM interpretations WHERE created < ?", (time.time() - self.ttl,))
+                self._db.execute(
+                    "DELETE FROM interpretations WHERE key NOT IN ("
+                    "SELECT key FROM interpretations GROUP BY key ORDER BY MAX(created) DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"清理解牌缓存数据库失败: {e}")
+
+    def _close_db(self):
+        if self._db is not None:
+            try:
+                self._db.close()
+            except sqlite3.Error:
+                pass
+            self._db = None
+
+
+interpretation_cache = InterpretationCache()
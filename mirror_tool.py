@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+
+from .download_tool import DownloadResult, partial_path
+from .file_tool import DebouncedSave, discard_file, load_json, save_json
+
+logger = logging.getLogger("tarots_mirror_tool")
+
+# 合并多次测量后再写入镜像统计的等待时间（秒）
+STATS_SAVE_DELAY = 5.0
+# 尚未测量过的镜像的假定耗时（秒），按声明顺序略微递增，保证未测量时按声明顺序尝试
+UNMEASURED_LATENCY = 2.0
+# 耗时滑动平均的新样本权重
+EWMA_ALPHA = 0.3
+# 连续失败后的冷却时间上限（秒）
+MAX_COOLDOWN = 600.0
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def is_local_mirror(base: str) -> bool:
+    """镜像是否为本地目录（file:// 地址或文件系统路径）"""
+    scheme = urlparse(base).scheme
+    return scheme == "file" or scheme == "" or (len(scheme) == 1 and base[1:3] in (":\\", ":/"))
+
+
+def local_mirror_path(base: str, img_path: str) -> Path:
+    """本地镜像中一张图片的路径"""
+    if urlparse(base).scheme == "file":
+        root = Path(url2pathname(urlparse(base).path))
+    else:
+        root = Path(base)
+    return root / unquote(img_path)
+
+
+def mirror_url(base: str, img_path: str) -> str:
+    """远程镜像中一张图片的地址"""
+    return f"{base}{img_path}"
+
+
+def mirror_target(save_path: Path, base: str) -> Path:
+    """
+    每个镜像使用独立的部分文件，对冲请求并行写入时互不干扰，
+    中断后也只会向同一个镜像续传
+    """
+    mirror_id = hashlib.sha1(base.encode("utf-8")).hexdigest()[:8]
+    return save_path.with_name(f"{save_path.name}.{mirror_id}")
+
+
+def deck_mirrors(meta: Any, deck_name: str, templates: Iterable[str] = ()) -> List[str]:
+    """
+    牌组的全部图片源：_meta.base_url、_meta.mirrors，以及配置中的镜像模板（{deck} 替换为牌组名）
+    :return: 去重后的镜像根地址列表，保持声明顺序
+    """
+    candidates = [meta.get("base_url", "")]
+    candidates.extend(meta.get("mirrors", ()) or ())
+    candidates.extend(template.replace("{deck}", deck_name) for template in templates)
+    mirrors = []
+    for base in candidates:
+        if base and base not in mirrors:
+            mirrors.append(base)
+    return mirrors
+
+
+def copy_local(src: Path, save_path: Path, chunk_size: int = 1 << 20) -> DownloadResult:
+    """从本地镜像复制图片到部分文件并计算sha256，之后同样交给 finish_download"""
+    part_path = partial_path(save_path)
+    hasher = hashlib.sha256()
+    try:
+        with open(src, "rb") as source, open(part_path, "wb") as target:
+            for chunk in iter(lambda: source.read(chunk_size), b""):
+                hasher.update(chunk)
+                target.write(chunk)
+    except BaseException:
+        discard_file(part_path)
+        raise
+    return DownloadResult(part_path, hasher.hexdigest(), None, None)
+
+
+class MirrorSelector:
+    """
+    记录每个镜像的耗时滑动平均和成功率，按 耗时/成功率 排序，
+    连续失败的镜像进入指数增长的冷却期。统计会持久化，重启后仍记得每个牌组最快的镜像。
+    """
+
+    def __init__(self, stats_path: Path):
+        self.stats_path = stats_path
+        self._lock = threading.RLock()
+        self._stats: Optional[Dict[str, Dict[str, Any]]] = None
+        self._saver = DebouncedSave(self.save, STATS_SAVE_DELAY)
+
+    def rank(self, mirrors: List[str]) -> List[str]:
+        """按预期表现从好到坏排列镜像，冷却中的镜像排在最后"""
+        now = time.time()
+
+        def score(item: Tuple[int, str]) -> Tuple[bool, float]:
+            index, base = item
+            stat = self._get_stats().get(base, {})
+            latency = stat.get("latency", UNMEASURED_LATENCY + index * 0.01)
+            success_rate = (stat.get("successes", 0) + 1) / (stat.get("successes", 0) + stat.get("failures", 0) + 2)
+            cooling = now < stat.get("cooldown_until", 0)
+            return cooling, latency / success_rate
+
+        with self._lock:
+            return [base for _, base in sorted(enumerate(mirrors), key=score)]
+
+    def best(self, mirrors: List[str]) -> Optional[str]:
+        ranked = self.rank(mirrors)
+        return ranked[0] if ranked else None
+
+    def record_success(self, base: str, seconds: float):
+        with self._lock:
+            stat = self._get_stats().setdefault(base, {})
+            previous = stat.get("latency")
+            stat["latency"] = seconds if previous is None else previous + EWMA_ALPHA * (seconds - previous)
+            stat["successes"] = stat.get("successes", 0) + 1
+            stat["consecutive_failures"] = 0
+            stat["cooldown_until"] = 0
+            self._saver.schedule()
+
+    def record_failure(self, base: str):
+        with self._lock:
+            stat = self._get_stats().setdefault(base, {})
+            stat["failures"] = stat.get("failures", 0) + 1
+            streak = stat.get("consecutive_failures", 0) + 1
+            stat["consecutive_failures"] = streak
+            # 第一次失败不冷却，之后 10s、20s、40s……直到上限
+            if streak > 1:
+                stat["cooldown_until"] = time.time() + min(MAX_COOLDOWN, 10.0 * 2 ** (streak - 2))
+            self._saver.schedule()
+
+    def describe(self, mirrors: List[str]) -> List[str]:
+        """按排名列出镜像的统计，供指令展示"""
+        now = time.time()
+        lines = []
+        with self._lock:
+            for base in self.rank(mirrors):
+                stat = self._get_stats().get(base)
+                if not stat:
+                    lines.append(f"{base}：尚未使用")
+                    continue
+                latency = f"平均{stat['latency'] * 1000:.0f}ms" if "latency" in stat else "尚未成功"
+                line = f"{base}：{latency}，成功{stat.get('successes', 0)}次，失败{stat.get('failures', 0)}次"
+                if now < stat.get("cooldown_until", 0):
+                    line += f"，冷却中（剩余{stat['cooldown_until'] - now:.0f}秒）"
+                lines.append(line)
+        return lines
+
+    def _get_stats(self) -> Dict[str, Dict[str, Any]]:
+        if self._stats is None:
+            data = load_json(self.stats_path, {}, "镜像统计文件")
+            stats = data.get("mirrors") if isinstance(data, dict) else None
+            self._stats = stats if isinstance(stats, dict) else {}
+        return self._stats
+
+    def save(self):
+        """把镜像统计原子写入缓存目录"""
+        with self._lock:
+            self._saver.cancel()
+            if self._stats is not None:
+                save_json(self.stats_path, {"mirrors": self._stats}, "镜像统计")
+
+
+async def hedged_race(
+    candidates: List[T],
+    fetch: Callable[[T], Awaitable[Optional[R]]],
+    hedge_delay: float,
+) -> Optional[Tuple[T, R]]:
+    """
+    按顺序向候选发起请求：当前请求失败时立即换下一个，
+    超过 hedge_delay 秒仍未完成时额外向下一个发起对冲请求，先成功者胜出，其余请求取消。
+    :param candidates: 按优先级排好序的候选
+    :param fetch: 请求函数，失败时返回None
+    :param hedge_delay: 对冲等待时间（秒），0为不对冲（只在失败时切换）
+    :return: (胜出的候选, 结果)，全部失败时返回None
+    """
+    pending: Dict[asyncio.Task, T] = {}
+    remaining = list(candidates)
+    try:
+        while remaining or pending:
+            if remaining and not pending:
+                candidate = remaining.pop(0)
+                pending[asyncio.ensure_future(fetch(candidate))] = candidate
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=hedge_delay if remaining and hedge_delay > 0 else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                # 超时未完成，对冲到下一个候选
+                candidate = remaining.pop(0)
+                logger.info(f"[图片下载] 请求较慢，同时尝试下一个镜像: {candidate}")
+                pending[asyncio.ensure_future(fetch(candidate))] = candidate
+                continue
+            for task in done:
+                candidate = pending.pop(task)
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    logger.warning(f"[图片下载] 镜像请求异常: {candidate} - {task.exception()}")
+                    continue
+                if task.result() is not None:
+                    return candidate, task.result()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+mirror_selector = MirrorSelector(Path(__file__).parent.absolute() / "tarots_cache" / "mirrors.json")
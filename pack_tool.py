@@ -0,0 +1,189 @@
+import base64
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .file_tool import atomic_write_bytes, discard_file
+
+logger = logging.getLogger("tarots_pack_tool")
+
+PACK_NAME = "deck.tarotpack"
+PACK_MAGIC = b"TAROTPK1"
+PACK_VERSION = 1
+# 文件头：魔数 + 索引JSON长度（小端uint32）
+_HEADER = struct.Struct("<8sI")
+
+# 索引键：(卡牌ID, 朝向 norm/rev, 规格 original 或发送用图片的规格标识)
+EntryKey = Tuple[str, str, str]
+
+
+class PackError(Exception):
+    """牌组包格式错误"""
+
+
+class DeckPack:
+    """
+    单文件牌组包：文件头之后是索引JSON（牌组数据、牌阵配置和每张图片的偏移/长度），
+    再之后依次存放图片内容。通过mmap只读映射，取图时直接从映射切片，不必每次打开和读取文件。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, index_len = _HEADER.unpack_from(self._mmap, 0)
+            if magic != PACK_MAGIC:
+                raise PackError(f"不是牌组包文件: {path}")
+            index = json.loads(self._mmap[_HEADER.size:_HEADER.size + index_len].decode("utf-8"))
+            if index.get("version") != PACK_VERSION:
+                raise PackError(f"不支持的牌组包版本: {index.get('version')}")
+        except (struct.error, ValueError) as e:
+            self._mmap.close()
+            raise PackError(f"牌组包损坏: {path} - {e}") from e
+        except PackError:
+            self._mmap.close()
+            raise
+        self.deck_name: str = index.get("deck", "")
+        self.deck: Dict[str, Any] = index.get("deck_data", {})
+        self.formations: Dict[str, Any] = index.get("formations", {})
+        self._entries: Dict[EntryKey, Tuple[int, int, str]] = {
+            (card_id, orientation, variant): (offset, length, name)
+            for card_id, orientation, variant, offset, length, name in index.get("entries", [])
+        }
+
+    def __contains__(self, key: EntryKey) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def view(self, card_id: str, orientation: str, variant: str = "original") -> Optional[memoryview]:
+        """
+        图片内容的零拷贝视图，使用完毕后应调用 release()
+        :return: 映射切片，包内没有该图片时返回None
+        """
+        entry = self._entries.get((card_id, orientation, variant))
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        return memoryview(self._mmap)[offset:offset + length]
+
+    def read_bytes(self, card_id: str, orientation: str, variant: str = "original") -> Optional[bytes]:
+        """复制出图片内容"""
+        view = self.view(card_id, orientation, variant)
+        if view is None:
+            return None
+        with view:
+            return bytes(view)
+
+    def read_base64(self, card_id: str, orientation: str, variant: str = "original") -> Optional[str]:
+        """直接从映射编码为base64字符串（发送图片用）"""
+        view = self.view(card_id, orientation, variant)
+        if view is None:
+            return None
+        with view:
+            return base64.b64encode(view).decode("utf-8")
+
+    def entries(self) -> List[Tuple[EntryKey, str]]:
+        """包内所有图片的 (索引键, 原始相对路径)"""
+        return [(key, name) for key, (_, _, name) in self._entries.items()]
+
+    def close(self):
+        """关闭映射；仍有视图未释放时保留映射，交给垃圾回收"""
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+
+def build_pack(
+    path: Path,
+    deck_name: str,
+    deck_data: Mapping,
+    formations: Mapping,
+    images: Iterable[Tuple[EntryKey, Path, str]],
+) -> int:
+    """
+    把牌组数据和图片写成单个牌组包，先写同目录临时文件再原子替换
+    :param path: 牌组包路径
+    :param deck_name: 牌组名称
+    :param deck_data: 牌组数据（tarots.json内容）
+    :param formations: 牌阵配置（formation.json内容）
+    :param images: (索引键, 图片文件, 解包时恢复的相对路径) 列表
+    :return: 打包的图片数
+    """
+    images = list(images)
+    sizes = [source.stat().st_size for _, source, _ in images]
+
+    # 索引中的偏移依赖索引自身的长度，先用占位偏移估算长度，再用真实偏移写入
+    def make_index(base: int) -> bytes:
+        entries = []
+        offset = base
+        for ((card_id, orientation, variant), _, name), size in zip(images, sizes):
+            entries.append([card_id, orientation, variant, offset, size, name])
+            offset += size
+        return json.dumps({
+            "version": PACK_VERSION,
+            "deck": deck_name,
+            "deck_data": _thaw(deck_data),
+            "formations": _thaw(formations),
+            "entries": entries,
+        }, ensure_ascii=False).encode("utf-8")
+
+    index = make_index(0)
+    while True:
+        padded = make_index(_HEADER.size + len(index))
+        if len(padded) == len(index):
+            break
+        index = padded
+    index = padded
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(PACK_MAGIC, len(index)))
+            f.write(index)
+            for (_, source, _), size in zip(images, sizes):
+                with open(source, "rb") as src:
+                    data = src.read()
+                if len(data) != size:
+                    raise PackError(f"打包期间文件发生变化: {source}")
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        discard_file(Path(tmp_name))
+        raise
+    return len(images)
+
+
+def unpack_images(pack: DeckPack, target_dir: Path) -> int:
+    """
+    把牌组包中的图片按原始相对路径还原到缓存目录
+    :return: 还原的图片数
+    """
+    count = 0
+    for (card_id, orientation, variant), name in pack.entries():
+        target = (target_dir / name).resolve()
+        if target_dir.resolve() not in target.parents:
+            raise PackError(f"牌组包中的路径越界: {name}")
+        atomic_write_bytes(target, pack.read_bytes(card_id, orientation, variant))
+        count += 1
+    return count
+
+
+def _thaw(data: Any) -> Any:
+    """把注册表的只读视图还原为可序列化的dict/list"""
+    if isinstance(data, Mapping):
+        return {key: _thaw(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_thaw(item) for item in data]
+    return data
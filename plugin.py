@@ -2,7 +2,8 @@ from src.plugin_system.base.base_plugin import BasePlugin
 from src.plugin_system.apis.plugin_register_api import register_plugin
 from src.plugin_system.base.base_action import BaseAction, ActionActivationType
 from src.plugin_system.base.base_command import BaseCommand
-from src.plugin_system.base.component_types import ComponentInfo
+from src.plugin_system.base.base_events_handler import BaseEventHandler
+from src.plugin_system.base.component_types import ComponentInfo, EventType
 from src.plugin_system.base.config_types import ConfigField
 from src.plugin_system.apis import generator_api, database_api, config_api, send_api
 from src.common.database.database_model import Messages, PersonInfo
@@ -10,23 +11,960 @@ from src.person_info.person_info import person_info_manager, Person, get_person_
 from src.common.logger import get_logger
 from src.plugin_system.apis.database_api import db_get
 from PIL import Image
-from typing import Tuple, Dict, Optional, List, Any, Type
+from typing import Tuple, Dict, Optional, List, Any, Type, Mapping, Callable, Awaitable
 from pathlib import Path
+from dataclasses import dataclass
+from datetime import date
 import traceback
-import tomlkit
 import json
-import random
 import asyncio
 import aiohttp
 import base64
-import toml
-import io
-import os
+import time
 import re
 
+from .deck_tool import deck_registry
+from .config_tool import config_store
+from .cache_tool import get_deck_cache, save_all_manifests, payload_cache, hash_file, CACHE_VALID, CACHE_STALE
+from .image_tool import rotate_image_bytes, validate_image_integrity, compose_spread, TransportProfile
+from .download_tool import http_client, download_flights, stream_download, finish_download, discard_partial, DownloadError
+from .file_tool import read_bytes, read_base64, atomic_write_text, discard_file
+from .worker_tool import worker_pool
+from .send_tool import send_scheduler
+from .pack_tool import build_pack, unpack_images
+from .stats_tool import metrics, timed
+from .coalesce_tool import draw_coalescer
+from .draw_tool import card_indices, draw_reading, new_seed, simulate
+from .fortune_tool import fortune_store, fortune_day, fortune_seed, seconds_until, DAILY_FORMATION, DAILY_SPREAD
+from .admission_tool import admission, AdmissionRejected
+from .interpretation_tool import interpretation_cache, interpretation_key
+from .mirror_tool import (
+    mirror_selector, deck_mirrors, hedged_race, is_local_mirror, local_mirror_path, mirror_url, mirror_target, copy_local
+)
+
 logger = get_logger("tarots")
 
-class TarotsAction(BaseAction):
+class TarotsCacheMixin:
+    """牌组资源与图片缓存的公共逻辑，使用方需提供 base_dir、config、log_prefix 并调用 _bind_deck"""
+
+    @timed("config")
+    def _load_config(self) -> Dict[str, Any]:
+        """从同级目录的config.toml加载配置（使用进程级快照，文件变化时才重新解析）"""
+        try:
+            config_data = config_store.snapshot()
+            
+            # 构建配置字典，使用get方法安全访问嵌套值
+            config = {
+                "permissions": {
+                    "admin_users": config_data.get("permissions", {}).get("admin_users", [])
+                },
+                "proxy": {
+                    "enable_proxy": config_data.get("proxy", {}).get("enable_proxy", False),
+                    "proxy_url": config_data.get("proxy", {}).get("proxy_url", "")
+                },
+                "cards": {
+                    "using_cards": config_data.get("cards", {}).get("using_cards", 'bilibili'),
+                    "use_cards": config_data.get("cards", {}).get("use_cards", ['bilibili','east'])
+                },
+                "adjustment": {
+                    "enable_original_text": config_data.get("adjustment", {}).get("enable_original_text", False)
+                },
+                "download": {
+                    "concurrency": config_data.get("download", {}).get("concurrency", 8),
+                    "max_connections": config_data.get("download", {}).get("max_connections", 16),
+                    "per_host_connections": config_data.get("download", {}).get("per_host_connections", 8),
+                    "progress_interval": config_data.get("download", {}).get("progress_interval", 10),
+                    "mirrors": config_data.get("download", {}).get("mirrors", []),
+                    "hedge_delay": config_data.get("download", {}).get("hedge_delay", 3.0)
+                },
+                "send": {
+                    "global_rate": config_data.get("send", {}).get("global_rate", 5.0),
+                    "global_burst": config_data.get("send", {}).get("global_burst", 10),
+                    "chat_rate": config_data.get("send", {}).get("chat_rate", 2.0),
+                    "chat_burst": config_data.get("send", {}).get("chat_burst", 3)
+                },
+                "composite": {
+                    "enable_composite": config_data.get("composite", {}).get("enable_composite", False),
+                    "thumb_width": config_data.get("composite", {}).get("thumb_width", 240),
+                    "font_path": config_data.get("composite", {}).get("font_path", "")
+                },
+                "performance": {
+                    "io_workers": config_data.get("performance", {}).get("io_workers", 4),
+                    "cpu_workers": config_data.get("performance", {}).get("cpu_workers", 0)
+                },
+                "admission": {
+                    "max_active": config_data.get("admission", {}).get("max_active", 8),
+                    "max_queue": config_data.get("admission", {}).get("max_queue", 16),
+                    "queue_timeout": config_data.get("admission", {}).get("queue_timeout", 20),
+                    "per_user": config_data.get("admission", {}).get("per_user", 2),
+                    "per_chat": config_data.get("admission", {}).get("per_chat", 4),
+                    "download_concurrency": config_data.get("admission", {}).get("download_concurrency", 8),
+                    "image_concurrency": config_data.get("admission", {}).get("image_concurrency", 4),
+                    "llm_concurrency": config_data.get("admission", {}).get("llm_concurrency", 4)
+                },
+                "cache": {
+                    "payload_cache_mb": config_data.get("cache", {}).get("payload_cache_mb", 32)
+                },
+                "daily": {
+                    "enable_daily": config_data.get("daily", {}).get("enable_daily", True),
+                    "enable_precompute": config_data.get("daily", {}).get("enable_precompute", False),
+                    "precompute_hour": config_data.get("daily", {}).get("precompute_hour", 5),
+                    "active_days": config_data.get("daily", {}).get("active_days", 7),
+                    "pregenerate_interpretation": config_data.get("daily", {}).get("pregenerate_interpretation", False)
+                },
+                "coalesce": {
+                    "enable_coalesce": config_data.get("coalesce", {}).get("enable_coalesce", False),
+                    "window": config_data.get("coalesce", {}).get("window", 1.5),
+                    "max_batch": config_data.get("coalesce", {}).get("max_batch", 4)
+                },
+                "interpretation": {
+                    "enable_cache": config_data.get("interpretation", {}).get("enable_cache", False),
+                    "variants": config_data.get("interpretation", {}).get("variants", 3),
+                    "ttl_hours": config_data.get("interpretation", {}).get("ttl_hours", 24),
+                    "max_entries": config_data.get("interpretation", {}).get("max_entries", 2000),
+                    "persist": config_data.get("interpretation", {}).get("persist", False),
+                    "style_version": config_data.get("interpretation", {}).get("style_version", "1")
+                },
+                "stats": {
+                    "window": config_data.get("stats", {}).get("window", 512),
+                    "log_interval": config_data.get("stats", {}).get("log_interval", 0)
+                },
+                "warmup": {
+                    "enable_warmup": config_data.get("warmup", {}).get("enable_warmup", False),
+                    "all_decks": config_data.get("warmup", {}).get("all_decks", False),
+                    "concurrency": config_data.get("warmup", {}).get("concurrency", 2),
+                    "start_delay": config_data.get("warmup", {}).get("start_delay", 30)
+                },
+                "transport": {
+                    "enable_transport": config_data.get("transport", {}).get("enable_transport", True),
+                    "max_dimension": config_data.get("transport", {}).get("max_dimension", 1024),
+                    "image_format": config_data.get("transport", {}).get("image_format", "JPEG"),
+                    "quality": config_data.get("transport", {}).get("quality", 85),
+                    "max_kb": config_data.get("transport", {}).get("max_kb", 512)
+                }
+            }
+            return config
+        except Exception as e:
+            logger.error(f"{self.log_prefix} 加载配置失败: {e}")
+            raise
+
+    def _bind_deck(self, deck_name: str):
+        """绑定要操作的牌组：初始化缓存路径并加载卡牌数据"""
+        self.using_cards = deck_name
+        if not self.using_cards:
+            self.cache_dir = self.base_dir / "tarots_cache" / "default"
+        else:
+            self.cache_dir = self.base_dir / "tarots_cache" / self.using_cards # 定义图片缓存主文件夹为tarots_cache，后面紧随牌组文件夹名
+            self.cache_dir.mkdir(parents=True, exist_ok=True) # 不存在该文件夹就创建
+        self.deck_cache = get_deck_cache(self.cache_dir)
+
+        # 同步统计配置（支持热重载）
+        stats_config = self.config["stats"]
+        metrics.configure(
+            window=int(stats_config.get("window", 512)),
+            log_interval=float(stats_config.get("log_interval", 0)),
+        )
+
+        # 同步图片工作池配置（支持热重载）
+        performance = self.config["performance"]
+        worker_pool.configure(
+            io_workers=int(performance.get("io_workers", 4)),
+            cpu_workers=int(performance.get("cpu_workers", 0)),
+        )
+
+        # 同步准入控制配置（支持热重载）
+        admission_config = self.config["admission"]
+        admission.configure(
+            max_active=int(admission_config.get("max_active", 8)),
+            max_queue=int(admission_config.get("max_queue", 16)),
+            queue_timeout=float(admission_config.get("queue_timeout", 20)),
+            per_user=int(admission_config.get("per_user", 2)),
+            per_chat=int(admission_config.get("per_chat", 4)),
+            stage_limits={
+                "download": int(admission_config.get("download_concurrency", 8)),
+                "image": int(admission_config.get("image_concurrency", 4)),
+                "llm": int(admission_config.get("llm_concurrency", 4)),
+            },
+        )
+
+        # 加载卡牌数据
+        self.card_map: Mapping = {}
+        self.formation_map: Mapping = {}
+        self._load_resources()
+
+    @timed("deck_load")
+    def _load_resources(self):
+        """从进程级牌组注册表获取共享的只读资源，文件未变化时不会重新解析"""
+        try:
+            if not self.using_cards:
+                logger.info("没有加载到任何可用牌组")
+                return
+            # 加载卡牌数据
+            card_map = deck_registry.get_deck(self.using_cards)
+            if card_map is None:
+                raise FileNotFoundError(f"牌组文件不存在: {deck_registry.deck_path(self.using_cards)}")
+            self.card_map = card_map
+
+            # 加载牌阵配置
+            self.formation_map = deck_registry.get_formations(self.using_cards)
+
+            logger.debug(f"{self.log_prefix} 已加载{self.card_map['_meta']['total_cards']}张卡牌和{len(self.formation_map)}种抽牌方式")
+        except UnicodeDecodeError as e:
+            logger.error(f"{self.log_prefix} 编码错误: 请确保JSON文件为UTF-8格式 - {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"{self.log_prefix} 资源加载失败: {str(e)}")
+            raise
+
+    def get_available_card_type(self, user_requested_type):
+        """获取当前牌组支持的卡牌类型"""
+        supported_type = self.card_map.get("_meta", {}).get("card_types", "")
+        # 如果牌组支持全部，或者用户请求与牌组支持的一致，就用用户请求的
+        if supported_type == '全部' or user_requested_type == supported_type:
+            return user_requested_type
+        else:
+            # 否则用牌组支持的类型
+            return supported_type
+
+    def _fortune_cards(self, user_key: str, day: date) -> List[Tuple[str, bool]]:
+        """某用户某天在当前牌组的每日一抽，结果只取决于 (用户, 日期, 牌组)"""
+        card_type = self.get_available_card_type("全部")
+        return draw_reading(card_type, DAILY_SPREAD["cards_num"], True, fortune_seed(user_key, day, self.using_cards))
+
+    def _format_reading(self, title: str, formation: Mapping, selected_cards: List[Tuple[str, bool]]) -> str:
+        """构建完整的牌面文本"""
+        represent_list = formation["represent"] # 该抽牌方式所包含的预言方向内容
+        result_text = f"{title}\n"
+        for idx, (card_id, is_reverse) in enumerate(selected_cards):
+            card_data = self.card_map[card_id]
+            card_info = card_data["info"]
+            pos_name = represent_list[0][idx] if idx < len(represent_list[0]) else f"位置{idx+1}"
+            desc = card_info['reverseDescription'] if is_reverse else card_info['description']
+            result_text += (
+                f"\n{pos_name} - {'逆位' if is_reverse else '正位'} {card_data['name']}\n"
+                f"{desc[:100]}...\n"
+            )
+        return result_text
+
+    def _get_cacheable_ids(self) -> Optional[List[str]]:
+        """当前牌组包含的全部卡牌ID，牌组类型未知时返回None"""
+        support_type = self.get_available_card_type("全部")
+        if support_type == '全部':
+            return [str(i) for i in range(78)]
+        elif support_type == '大阿卡纳':
+            return [str(i) for i in range(22)]
+        elif support_type == '小阿卡纳':
+            return [str(i) for i in range(22,78)]
+        return None
+
+    @timed("payload")
+    async def _get_card_payload(self, card_id: str, is_reverse: bool) -> Optional[str]:
+        """获取可直接发送的base64图片负载，优先命中进程内LRU缓存"""
+        payload_cache.resize(int(self.config["cache"].get("payload_cache_mb", 32)) * 1024 * 1024)
+        profile = self._get_transport_profile()
+        key = (
+            self.deck_cache.deck_name,
+            card_id,
+            "rev" if is_reverse else "norm",
+            profile.key if profile else "original",
+        )
+        b64_data = payload_cache.get(key)
+        if b64_data is not None:
+            return b64_data
+
+        try:
+            # 牌组已打包时直接从内存映射编码，不必打开和读取散装文件；打包后重新下载过的牌改用散装文件
+            pack = deck_registry.get_image_pack(self.using_cards, key[1:], self.deck_cache.norm_path(card_id))
+            if pack is not None:
+                b64_data = await worker_pool.run_io(pack.read_base64, *key[1:])
+            else:
+                image_path = await self._get_card_image_path(card_id, is_reverse)
+                if not image_path:
+                    return None
+                # 读盘和base64编码放到工作线程，不阻塞事件循环
+                b64_data = await worker_pool.run_io(read_base64, image_path)
+        except Exception as e:
+            logger.warning(f"{self.log_prefix} 读取图片失败: {str(e)}")
+            return None
+        payload_cache.put(key, b64_data)
+        return b64_data
+
+    async def _get_card_image(self, card_id: str, is_reverse: bool) -> Optional[bytes]:
+        """获取卡牌图片（有缓存机制）"""
+        image_path = await self._get_card_image_path(card_id, is_reverse)
+        if not image_path:
+            return None
+        try:
+            return await worker_pool.run_io(read_bytes, image_path)
+        except Exception as e:
+            logger.warning(f"{self.log_prefix} 读取图片失败: {str(e)}")
+            return None
+
+    async def _get_card_image_path(self, card_id: str, is_reverse: bool) -> Optional[Path]:
+        """获取要发送的卡牌图片路径，缺失时下载并生成派生图片"""
+        try:
+            cache_path = self.deck_cache.norm_path(card_id)
+            success, _ = await self._ensure_card_cached(card_id)
+            if not success:
+                return None
+            
+            # 优先发送压缩过的派生图片，生成失败时回退到原图
+            profile = self._get_transport_profile()
+            send_path = await self._ensure_transport_image(card_id, is_reverse, profile) if profile else None
+            if send_path:
+                cache_path = send_path
+            elif is_reverse:
+                cache_path = await self._ensure_reversed_image(card_id) # 逆位牌使用预先旋转好的缓存图片
+                if not cache_path:  # 旋转失败
+                    return None
+
+            return cache_path
+
+        except Exception as e:
+            logger.warning(f"{self.log_prefix} 获取图片失败: {str(e)}")
+            return None
+
+    async def _ensure_card_cached(self, card_id: str, prepare_variants: bool = False) -> Tuple[bool, bool]:
+        """确保正位原图已缓存且完整，返回 (是否可用, 是否重新下载了损坏或过期的文件)
+
+        同一牌组同一张牌的并发请求（多个聊天同时抽到、抽牌与缓存指令重叠）只会执行一次，其余等待共享结果。
+        共享的校验不生成派生图片，需要时由各调用方在之后自行准备（已是最新的派生图片不会重复生成）。
+        """
+        success, redownloaded = await download_flights.run(
+            (self.deck_cache.deck_name, card_id),
+            lambda: self._ensure_card_cached_once(card_id),
+        )
+        if success and prepare_variants:
+            await self._prepare_card_variants(card_id)
+        return success, redownloaded
+
+    async def _ensure_card_cached_once(self, card_id: str) -> Tuple[bool, bool]:
+        cache_path = self.deck_cache.norm_path(card_id)
+        redownloaded = False
+        # 检查缓存文件是否存在且有效
+        if not cache_path.exists() or not await self._check_cached_image(card_id, cache_path):
+            if cache_path.exists():
+                logger.warning(f"{self.log_prefix} 发现损坏或过期的缓存文件，准备重新下载: {cache_path}")
+                redownloaded = True
+                try:
+                    self.deck_cache.forget(card_id)
+                    cache_path.unlink()
+                except Exception as e:
+                    logger.error(f"{self.log_prefix} 删除损坏文件失败: {str(e)}")
+                    return False, redownloaded
+
+            # 下载图片（下载成功时会同时生成派生图片）
+            metrics.incr("disk_cache.miss")
+            success = await self._download_image(card_id, cache_path)
+            return success, redownloaded
+
+        metrics.incr("disk_cache.hit")
+        return True, redownloaded
+
+    async def _refresh_card(self, card_id: str) -> Tuple[bool, bool]:
+        """向上游重新校验一张已缓存的牌，返回 (是否可用, 是否取得了新内容)"""
+        cache_path = self.deck_cache.norm_path(card_id)
+        if not cache_path.exists() or not await self._check_cached_image(card_id, cache_path):
+            # 缺失或损坏的牌按普通缓存流程处理
+            return await self._ensure_card_cached(card_id, prepare_variants=True)
+
+        before = self.deck_cache.entry(card_id) or {}
+        success = await download_flights.run(
+            (self.deck_cache.deck_name, "refresh", card_id),
+            lambda: self._download_image(card_id, cache_path, revalidate=True),
+        )
+        after = self.deck_cache.entry(card_id) or {}
+        if success:
+            await self._prepare_card_variants(card_id)
+        return success, success and before.get("sha256") != after.get("sha256")
+
+    async def _cache_cards(
+        self,
+        card_ids: List[str],
+        concurrency: int = 8,
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        progress_interval: float = 10.0,
+        refresh: bool = False,
+    ) -> Tuple[int, int]:
+        """
+        并发缓存一批卡牌及其派生图片
+        :param card_ids: 要缓存的卡牌ID
+        :param concurrency: 同时处理的卡牌数上限
+        :param on_progress: 进度回调 (已完成数, 总数)，每隔 progress_interval 秒最多触发一次
+        :param refresh: 是否向上游条件请求重新校验已缓存的牌
+        :return: (成功数, 重新下载数)，刷新时第二项为上游有更新的牌数
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def cache_one(card_id: str) -> Tuple[bool, bool]:
+            async with semaphore:
+                try:
+                    if refresh:
+                        return await self._refresh_card(card_id)
+                    return await self._ensure_card_cached(card_id, prepare_variants=True)
+                except Exception as e:
+                    logger.warning(f"{self.log_prefix} 缓存卡牌 {card_id} 失败: {str(e)}")
+                    return False, False
+
+        success_count = 0
+        redownload_count = 0
+        done_count = 0
+        last_report = time.monotonic()
+        for future in asyncio.as_completed([cache_one(card_id) for card_id in card_ids]):
+            success, redownloaded = await future
+            done_count += 1
+            success_count += success
+            redownload_count += redownloaded
+            if on_progress and done_count < len(card_ids) and time.monotonic() - last_report >= progress_interval:
+                last_report = time.monotonic()
+                await on_progress(done_count, len(card_ids))
+        return success_count, redownload_count
+
+    def _rotate_image(self, img_data: bytes) -> Optional[bytes]:
+        """将图片旋转180度生成逆位图片"""
+        try:
+            return rotate_image_bytes(img_data)
+            
+        except Exception as e:
+            logger.error(f"{self.log_prefix} 图片旋转失败: {str(e)}")
+            # 旋转失败时返回None
+            return None
+
+    @timed("rotate")
+    async def _ensure_reversed_image(self, card_id: str) -> Optional[Path]:
+        """获取逆位图片缓存路径，不存在或比正位原图旧时由正位原图旋转生成"""
+        try:
+            return await self.deck_cache.ensure_reversed(card_id)
+        except Exception as e:
+            logger.error(f"{self.log_prefix} 逆位图片生成失败: {card_id} - {str(e)}")
+            return None
+
+    def _get_transport_profile(self) -> Optional[TransportProfile]:
+        """读取发送用图片规格，未启用时返回None"""
+        transport = self.config.get("transport", {})
+        if not transport.get("enable_transport", True):
+            return None
+        image_format = str(transport.get("image_format", "JPEG")).upper()
+        if image_format not in ("JPEG", "WEBP", "PNG"):
+            image_format = "JPEG"
+        return TransportProfile(
+            max_dimension=int(transport.get("max_dimension", 1024)),
+            image_format=image_format,
+            quality=int(transport.get("quality", 85)),
+            max_bytes=int(transport.get("max_kb", 512)) * 1024,
+        )
+
+    @timed("transport")
+    async def _ensure_transport_image(self, card_id: str, is_reverse: bool, profile: TransportProfile) -> Optional[Path]:
+        """获取发送用派生图片路径，不存在或比正位原图旧时重新生成"""
+        try:
+            return await self.deck_cache.ensure_transport(card_id, is_reverse, profile)
+        except Exception as e:
+            logger.error(f"{self.log_prefix} 发送用图片生成失败: {card_id} - {str(e)}")
+            return None
+
+    async def _ensure_thumbnail(self, card_id: str) -> Optional[Path]:
+        """获取拼图用缩略图路径，不存在或比正位原图旧时重新生成"""
+        try:
+            return await self.deck_cache.ensure_thumbnail(card_id, int(self.config["composite"].get("thumb_width", 240)))
+        except Exception as e:
+            logger.error(f"{self.log_prefix} 缩略图生成失败: {card_id} - {str(e)}")
+            return None
+
+    @timed("composite")
+    async def _render_spread_payload(self, selected_cards: List[Tuple[str, bool]], formation: Mapping) -> Optional[str]:
+        """把一次占卜的全部牌面按牌阵布局拼成一张图片，返回base64负载；任一牌面不可用时返回None"""
+        try:
+            async def get_thumbnail(card_id: str) -> Optional[Path]:
+                success, _ = await self._ensure_card_cached(card_id)
+                return await self._ensure_thumbnail(card_id) if success else None
+
+            thumbnails = await asyncio.gather(*(get_thumbnail(card_id) for card_id, _ in selected_cards))
+            if not all(thumbnails):
+                return None
+
+            # 牌阵没有配置布局（或布局数量不够）时按每行4张排列
+            layout = formation.get("layout") or []
+            if len(layout) < len(selected_cards):
+                layout = [(idx % 4, idx // 4) for idx in range(len(selected_cards))]
+            represent = formation["represent"][0]
+            labels = []
+            for idx, (_, is_reverse) in enumerate(selected_cards):
+                pos_name = represent[idx] if idx < len(represent) else f"位置{idx+1}"
+                labels.append(f"{idx+1} {pos_name.split('，')[0]}{'(逆)' if is_reverse else ''}")
+
+            profile = self._get_transport_profile()
+            img_data = await worker_pool.run_cpu(
+                compose_spread,
+                [(path, is_reverse) for path, (_, is_reverse) in zip(thumbnails, selected_cards)],
+                [tuple(point) for point in layout[:len(selected_cards)]],
+                labels,
+                str(self.config["composite"].get("font_path", "")),
+                profile.image_format if profile else "JPEG",
+                profile.quality if profile else 85,
+            )
+            return await worker_pool.run_io(lambda: base64.b64encode(img_data).decode('utf-8'))
+        except Exception as e:
+            logger.error(f"{self.log_prefix} 牌阵拼图失败: {str(e)}")
+            return None
+
+    async def _prepare_card_variants(self, card_id: str) -> bool:
+        """预先生成一张牌的全部派生图片（逆位图片、正逆位发送用图片、拼图缩略图）"""
+        builds = [self._ensure_reversed_image(card_id)]
+        profile = self._get_transport_profile()
+        if profile:
+            builds.extend(self._ensure_transport_image(card_id, is_reverse, profile) for is_reverse in (False, True))
+        if self.config["composite"].get("enable_composite", False):
+            builds.append(self._ensure_thumbnail(card_id))
+        results = await asyncio.gather(*builds)
+        return all(path is not None for path in results)
+
+    @timed("rewrite_reply")
+    async def _rewrite_interpretation(
+        self,
+        result_text: str,
+        reason: str = "抽出了塔罗牌结果，请根据其内容为用户进行解牌",
+        chat_id: Optional[str] = None,
+    ) -> str:
+        """
+        让麦麦用自己的语言风格阐释结果，失败时返回空字符串
+        :param chat_id: 没有聊天上下文（例如后台预计算）时指定以哪个聊天的身份生成
+        """
+        target = {"chat_id": chat_id} if chat_id else {"chat_stream": getattr(self, "chat_stream", None)}
+        async with admission.stage("llm"):
+            status, llm_response = await generator_api.rewrite_reply(
+                **target,
+                reply_data={ 
+                "raw_reply": result_text,
+                "reason": reason
+                },
+                enable_splitter=False,
+                enable_chinese_typo=False
+            )
+        if status and llm_response and llm_response.reply_set and len(llm_response.reply_set) > 0:
+            # 合并所有消息片段
+            return llm_response.reply_set[0][1] if isinstance(llm_response.reply_set[0], tuple) else str(llm_response.reply_set[0])
+        return ""
+
+    def _http_session(self):
+        """借用插件共享的HTTP会话（异步上下文管理器），连接池上限随配置热更新"""
+        download_config = self.config["download"]
+        http_client.configure(
+            limit=int(download_config.get("max_connections", 16)),
+            limit_per_host=int(download_config.get("per_host_connections", 8)),
+        )
+        return http_client.session()
+
+    @timed("download")
+    async def _download_image(self, card_id: str, save_path: Path, revalidate: bool = False):
+        """图片本地缓存
+
+        牌组可以声明多个图片源（_meta.base_url、_meta.mirrors 和配置中的镜像模板，支持本地目录），
+        按测得的耗时和成功率排序后依次尝试，慢请求会对冲到下一个镜像。
+        revalidate 为True时按清单记录的ETag/Last-Modified发起条件请求，上游未变化（304）时不传输内容，
+        内容与本地副本一致时也不替换文件，派生图片保持有效。
+        """
+        MAX_RETRIES = 3
+        RETRY_DELAY = 2  # 初始重试间隔（秒）
+        NOT_MODIFIED = object()
+
+        try:
+            # 获取卡牌数据，清单中始终以牌组声明的主地址标识图片来源
+            full_url = self._get_card_url(card_id)
+            img_path = self.card_map[card_id]['info']['imgUrl']
+            download_config = self.config["download"]
+            mirrors = deck_mirrors(self.card_map['_meta'], self.using_cards, download_config.get("mirrors", []))
+            hedge_delay = float(download_config.get("hedge_delay", 3.0))
+            # 获取代理数据
+            enable_proxy = self.config["proxy"].get("enable_proxy", False)
+            if enable_proxy:
+                proxy_url = self.config["proxy"].get("proxy_url", "")
+            else:
+                proxy_url = None
+
+            # 刷新时使用本地副本的校验信息
+            known = self.deck_cache.entry(card_id) if revalidate and save_path.exists() else None
+            if known and known.get("url") != full_url:
+                known = None
+            conditional = {}
+            if known:
+                conditional = {"etag": known.get("etag"), "last_modified": known.get("last_modified")}
+
+            async def fetch(mirror: str):
+                """从单个镜像获取并校验图片，失败返回None"""
+                target = mirror_target(save_path, mirror)
+                started = time.perf_counter()
+                try:
+                    if is_local_mirror(mirror):
+                        result = await worker_pool.run_io(copy_local, local_mirror_path(mirror, img_path), target)
+                    else:
+                        # 分块流式写入同目录的部分文件并增量计算哈希，目标路径上永远不会出现写了一半的文件；
+                        # 上次中断留下的部分文件会按Range续传
+                        async with self._http_session() as http:
+                            result = await stream_download(http, mirror_url(mirror, img_path), target, proxy_url, **conditional)
+                except (DownloadError, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                    logger.warning(f"[图片下载] 镜像失败: {mirror} - {card_id} - {str(e)}")
+                    mirror_selector.record_failure(mirror)
+                    return None
+                if result is None:
+                    mirror_selector.record_success(mirror, time.perf_counter() - started)
+                    return NOT_MODIFIED
+                # 内容与本地副本相同时无需再次解码校验
+                if not (known and result.sha256 == known.get("sha256")) and not await self._validate_image_async(result.path):
+                    logger.warning(f"[图片下载] 完整性检测失败，丢弃文件: {mirror} - {save_path}")
+                    discard_partial(target)
+                    mirror_selector.record_failure(mirror)
+                    return None
+                mirror_selector.record_success(mirror, time.perf_counter() - started)
+                return result
+
+            # 下载尝试循环，每轮按最新的镜像排名尝试全部镜像
+            for attempt in range(1, MAX_RETRIES + 1):
+                ranked = mirror_selector.rank(mirrors)
+                logger.info(f"[图片下载] 尝试 {attempt}/{MAX_RETRIES} - {card_id} - 首选 {ranked[0] if ranked else '无'}")
+                async with admission.stage("download"):
+                    winner = await hedged_race(ranked, fetch, hedge_delay)
+                if winner is None:
+                    # 指数退避等待
+                    if attempt < MAX_RETRIES:
+                        await asyncio.sleep(RETRY_DELAY ** attempt)
+                    continue
+
+                mirror, result = winner
+                # 其他镜像留下的部分文件已无用
+                for other in mirrors:
+                    if other != mirror:
+                        discard_partial(mirror_target(save_path, other))
+                if result is NOT_MODIFIED:
+                    logger.debug(f"[图片下载] 上游未变化 {save_path.name}")
+                    return True
+
+                # 内容与本地副本相同（服务器不支持条件请求），只更新校验信息
+                if known and result.sha256 == known.get("sha256"):
+                    discard_partial(mirror_target(save_path, mirror))
+                    self.deck_cache.record(card_id, full_url, result.sha256, result.etag, result.last_modified)
+                    return True
+
+                # 已通过完整性检测，原子替换缓存文件
+                finish_download(result.path, save_path)
+                logger.info(f"[图片下载] 成功并通过完整性检测 {save_path.name} (尝试 {attempt}次，来源 {mirror})")
+                # 登记到缓存清单，之后命中缓存只需比对stat
+                self.deck_cache.record(card_id, full_url, result.sha256, result.etag, result.last_modified)
+                # 原图已更新，同步重建派生图片
+                self.deck_cache.discard_derived(card_id)
+                await self._prepare_card_variants(card_id)
+                return True
+
+            # 最终失败处理
+            logger.error(f"[图片下载] 终极失败 {full_url}，所有镜像均已达最大重试次数 {MAX_RETRIES}")
+            return False
+
+        except KeyError:
+            logger.error(f"[图片下载] 致命错误：卡牌 {card_id} 不存在于card_map中")
+            return False
+        
+        except Exception as e:
+            logger.error(f"{self.log_prefix} 图片下载失败: {str(e)}")
+            return False
+
+    def _get_card_url(self, card_id: str) -> str:
+        """构建卡牌图片的完整下载URL"""
+        return f"{self.card_map['_meta']['base_url']}{self.card_map[card_id]['info']['imgUrl']}"
+
+    @timed("cache_validate")
+    async def _check_cached_image(self, card_id: str, file_path: Path) -> bool:
+        """校验缓存的正位原图：清单命中时只比对stat，新文件或已变化的文件才完整解码"""
+        try:
+            url = self._get_card_url(card_id)
+            status = self.deck_cache.check(card_id, url)
+            if status == CACHE_VALID:
+                return True
+            if status == CACHE_STALE:
+                logger.info(f"{self.log_prefix} 牌组图片来源已变化，缓存失效: {file_path}")
+                return False
+            if not await self._validate_image_async(file_path):
+                return False
+            self.deck_cache.record(card_id, url, await worker_pool.run_io(hash_file, file_path))
+            return True
+        except Exception as e:
+            logger.error(f"{self.log_prefix} 缓存校验异常: {file_path} - {str(e)}")
+            return False
+
+    async def _validate_image_async(self, file_path: Path) -> bool:
+        """在工作池中完整解码校验图片，不阻塞事件循环"""
+        if worker_pool.has_process_pool:
+            valid = await worker_pool.run_cpu(validate_image_integrity, file_path)
+            if not valid:
+                logger.warning(f"{self.log_prefix} 图片损坏或格式错误: {file_path}")
+            return valid
+        return await worker_pool.run_io(self._validate_image_integrity, file_path)
+
+    def _validate_image_integrity(self, file_path: Path) -> bool:
+        """检查图片文件完整性"""
+        try:
+            # 检查文件是否存在
+            if not file_path.exists():
+                logger.debug(f"{self.log_prefix} 图片文件不存在: {file_path}")
+                return False
+            
+            # 检查文件大小（至少要有内容，不能是0字节）
+            if file_path.stat().st_size == 0:
+                logger.warning(f"{self.log_prefix} 图片文件为空: {file_path}")
+                return False
+            
+            # 尝试使用PIL打开图片来验证完整性
+            try:
+                with Image.open(file_path) as img:
+                    # 验证图片基本信息
+                    if img.size[0] <= 0 or img.size[1] <= 0:
+                        logger.warning(f"{self.log_prefix} 图片尺寸异常: {file_path}")
+                        return False
+                    
+                    # 尝试加载图片数据以确保文件没有损坏
+                    img.load()
+                    logger.debug(f"{self.log_prefix} 图片完整性校验通过: {file_path}")
+                    return True
+                    
+            except (Image.UnidentifiedImageError, OSError, IOError) as e:
+                logger.warning(f"{self.log_prefix} 图片损坏或格式错误: {file_path} - {str(e)}")
+                return False
+                
+        except Exception as e:
+            logger.error(f"{self.log_prefix} 图片完整性校验异常: {file_path} - {str(e)}")
+            return False
+
+
+class TarotsDeckCacher(TarotsCacheMixin):
+    """脱离聊天上下文的牌组缓存器，用于批量缓存非当前牌组"""
+
+    def __init__(self, deck_name: str, config: Dict[str, Any], log_prefix: str = "[Tarots]"):
+        self.base_dir = Path(__file__).parent.absolute()
+        self.config = config
+        self.log_prefix = f"{log_prefix}[{deck_name}]"
+        self._bind_deck(deck_name)
+
+
+class TarotsCacheWarmer(TarotsCacheMixin):
+    """插件加载后在后台预热牌面缓存（补齐缺失原图并生成派生图片），进度可通过指令查询"""
+
+    def __init__(self):
+        self.base_dir = Path(__file__).parent.absolute()
+        self.log_prefix = "[Tarots][预热]"
+        self.config: Dict[str, Any] = {}
+        self.state = "idle"  # idle / waiting / running / done / failed / cancelled
+        self.progress: Dict[str, List[int]] = {}  # 牌组名 -> [已处理, 总数, 成功数]
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, delay: Optional[float] = None) -> bool:
+        """
+        启动后台预热任务，不等待其完成
+        :param delay: 开始前的等待秒数，默认读取配置，避开麦麦启动时的繁忙期
+        :return: 是否成功启动（已有任务在运行时返回False）
+        """
+        if self.is_running:
+            return False
+        self.config = self._load_config()
+        if delay is None:
+            delay = float(self.config["warmup"].get("start_delay", 30))
+        self.state = "waiting"
+        self.progress = {}
+        self.started_at = None
+        self.finished_at = None
+        self._task = asyncio.create_task(self._run(max(0.0, delay)))
+        return True
+
+    def cancel(self):
+        """停止正在进行的预热"""
+        if self.is_running:
+            self._task.cancel()
+
+    async def _run(self, delay: float):
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            self.state = "running"
+            self.started_at = time.monotonic()
+            # 重新读取配置，等待期间的修改同样生效
+            self.config = self._load_config()
+            warmup_config = self.config["warmup"]
+            concurrency = max(1, int(warmup_config.get("concurrency", 2)))
+
+            decks = [self.config["cards"].get("using_cards", "")]
+            if warmup_config.get("all_decks", False):
+                decks += [deck for deck in self.config["cards"].get("use_cards", []) if deck not in decks]
+
+            # 逐个牌组低并发处理，把连接池和工作池留给用户的实时请求
+            for deck in decks:
+                if not deck:
+                    continue
+                try:
+                    cacher = TarotsDeckCacher(deck, self.config, "[Tarots][预热]")
+                except Exception as e:
+                    logger.warning(f"{self.log_prefix} 牌组 {deck} 加载失败，跳过预热: {e}")
+                    continue
+                card_ids = cacher._get_cacheable_ids()
+                if card_ids is None:
+                    continue
+                self.progress[deck] = [0, len(card_ids), 0]
+
+                async def report(done: int, total: int, deck: str = deck):
+                    self.progress[deck][0] = done
+
+                success_count, _ = await cacher._cache_cards(
+                    card_ids,
+                    concurrency=concurrency,
+                    on_progress=report,
+                    progress_interval=0,
+                )
+                self.progress[deck] = [len(card_ids), len(card_ids), success_count]
+                logger.info(f"{self.log_prefix} {deck}牌组预热完成：{success_count}/{len(card_ids)}")
+            self.state = "done"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            logger.error(f"{self.log_prefix} 缓存预热失败: {e}")
+        finally:
+            self.finished_at = time.monotonic()
+
+    def status_text(self) -> str:
+        """当前预热进度的可读描述"""
+        if self.state == "idle":
+            return "缓存预热未启动"
+        if self.state == "waiting":
+            return "缓存预热等待开始中"
+        state_names = {"running": "进行中", "done": "已完成", "failed": "失败", "cancelled": "已取消"}
+        lines = [f"缓存预热{state_names.get(self.state, self.state)}"]
+        if self.started_at is not None:
+            end = time.monotonic() if self.is_running else self.finished_at
+            lines[0] += f"，用时{end - self.started_at:.0f}秒"
+        for deck, (done, total, success) in self.progress.items():
+            line = f"{deck}：{done}/{total}"
+            if done >= total:
+                line += f"，成功{success}张"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+cache_warmer = TarotsCacheWarmer()
+
+
+class TarotsFortunePrecomputer(TarotsCacheMixin):
+    """
+    每天在设定的闲时为最近活跃的用户预先算好当天的每日一抽：补齐并预处理牌面图片、
+    预热内存负载缓存，可选预先生成解牌，早上集中抽取时直接使用预先准备好的结果
+    """
+
+    def __init__(self):
+        self.base_dir = Path(__file__).parent.absolute()
+        self.log_prefix = "[Tarots][每日一抽]"
+        self.config: Dict[str, Any] = {}
+        self.state = "idle"  # idle / scheduled / running / failed
+        self.last_day: Optional[date] = None
+        self.last_result: Tuple[int, int] = (0, 0)  # (准备好的用户数, 活跃用户数)
+        self._task: Optional[asyncio.Task] = None
+        self._run_lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> bool:
+        """启动每日定时预计算，已在运行时返回False"""
+        if self.is_running:
+            return False
+        self.state = "scheduled"
+        self._task = asyncio.create_task(self._loop())
+        return True
+
+    def cancel(self):
+        if self.is_running:
+            self._task.cancel()
+        self.state = "idle"
+
+    async def _loop(self):
+        while True:
+            hour = int(self._load_config()["daily"].get("precompute_hour", 5))
+            await asyncio.sleep(seconds_until(hour))
+            await self.run_once()
+
+    async def run_once(self) -> Tuple[int, int]:
+        """
+        为当天的活跃用户准备每日一抽
+        :return: (准备好的用户数, 活跃用户数)
+        """
+        async with self._run_lock:
+            previous_state = self.state
+            self.state = "running"
+            prepared = 0
+            users: List[Tuple[str, Optional[str]]] = []
+            try:
+                self.config = self._load_config()
+                daily_config = self.config["daily"]
+                self._bind_deck(self.config["cards"].get("using_cards", "bilibili"))
+                day = fortune_day()
+                users = fortune_store.active_users(day, int(daily_config.get("active_days", 7)))
+                pregenerate = daily_config.get("pregenerate_interpretation", False)
+                for user_key, chat_id in users:
+                    selected_cards = self._fortune_cards(user_key, day)
+                    ready = True
+                    for card_id, is_reverse in selected_cards:
+                        success, _ = await self._ensure_card_cached(card_id, prepare_variants=True)
+                        # 预热内存中的发送负载，抽取时无需再读盘编码
+                        ready = ready and success and await self._get_card_payload(card_id, is_reverse) is not None
+                    if not ready:
+                        continue
+                    if pregenerate and chat_id and fortune_store.get_reading(day, user_key, self.using_cards) is None:
+                        result_text = self._format_reading(f"【{DAILY_FORMATION} - {self.using_cards}牌组】", DAILY_SPREAD, selected_cards)
+                        message_text = await self._rewrite_interpretation(result_text, chat_id=chat_id)
+                        fortune_store.put_reading(day, user_key, self.using_cards, message_text)
+                    prepared += 1
+                fortune_store.save()
+                self.last_day = day
+                self.last_result = (prepared, len(users))
+                self.state = "scheduled" if previous_state == "scheduled" else "idle"
+                logger.info(f"{self.log_prefix} 已为 {prepared}/{len(users)} 位活跃用户准备好今天的每日一抽")
+            except asyncio.CancelledError:
+                self.state = "idle"
+                raise
+            except Exception as e:
+                self.state = "failed"
+                logger.error(f"{self.log_prefix} 每日一抽预计算失败: {e}")
+            return prepared, len(users)
+
+    def status_text(self) -> str:
+        states = {"idle": "未开启定时预计算", "scheduled": "已开启定时预计算", "running": "正在预计算", "failed": "上次预计算失败"}
+        lines = [f"每日一抽：{states.get(self.state, self.state)}"]
+        if self.last_day:
+            lines.append(f"{self.last_day.isoformat()} 已准备 {self.last_result[0]}/{self.last_result[1]} 位活跃用户")
+        stats = fortune_store.stats(fortune_day())
+        lines.append(f"记录的活跃用户 {stats['users']} 位，今天已有解牌 {stats['readings']} 份")
+        return "\n".join(lines)
+
+
+fortune_precomputer = TarotsFortunePrecomputer()
+
+
+@dataclass
+class DrawRequest:
+    """一次已完成抽牌、等待发送的占卜"""
+    action: "TarotsAction"
+    user_nickname: str
+    formation_name: str
+    formation: Mapping
+    selected_cards: List[Tuple[str, bool]]
+    result_text: str
+    daily_key: Optional[Tuple[date, str, str]] = None  # 每日一抽的 (日期, 用户标识, 牌组)
+
+
+class TarotsAction(TarotsCacheMixin, BaseAction):
     action_name = "tarots"
 
     # 双激活类型配置
@@ -42,7 +980,7 @@ class TarotsAction(BaseAction):
     action_description = "执行塔罗牌占卜，支持多种抽牌方式" # action描述
     action_parameters = {
         "card_type": "塔罗牌的抽牌范围，必填，只能填一个参数，这里请根据用户的要求填'全部'或'大阿卡纳'或'小阿卡纳'，如果用户的要求并不明确，默认填'全部'",
-        "formation": "塔罗牌的抽牌方式，必填，只能填一个参数，这里请根据用户的要求填'单张'或'圣三角'或'时间之流'或'四要素'或'五牌阵'或'吉普赛十字'或'马蹄'或'六芒星'，如果用户的要求并不明确，默认填'单张'",
+        "formation": "塔罗牌的抽牌方式，必填，只能填一个参数，这里请根据用户的要求填'单张'或'圣三角'或'时间之流'或'四要素'或'五牌阵'或'吉普赛十字'或'马蹄'或'六芒星'，用户想要今日运势或每日一抽时填'每日一抽'，如果用户的要求并不明确，默认填'单张'",
         "target_message": "提出抽塔罗牌的对方的发言内容，格式必须为：（用户名:发言内容），若不清楚是回复谁的话可以为None"
     }
     action_require = [
@@ -79,47 +1017,10 @@ class TarotsAction(BaseAction):
         self.config = self._load_config()
         self._update_available_card_sets()
 
-        # 初始化路径
-        self.using_cards = self.config["cards"].get("using_cards", 'bilibili')
-        if not self.using_cards:
-            self.cache_dir = self.base_dir / "tarots_cache" / "default"
-        else:
-            self.cache_dir = self.base_dir / "tarots_cache" / self.using_cards # 定义图片缓存主文件夹为tarots_cache，后面紧随牌组文件夹名
-            self.cache_dir.mkdir(parents=True, exist_ok=True) # 不存在该文件夹就创建
-
-        # 加载卡牌数据
-        self.card_map: Dict = {}
-        self.formation_map: Dict = {}
-        self._load_resources()
-
-    def _load_resources(self):
-        """同步加载资源文件(显式指定UTF-8编码)"""
-        try:
-            if not self.using_cards:
-                logger.info("没有加载到任何可用牌组")
-                return
-            # 加载卡牌数据
-            with open(
-                self.base_dir / f"tarot_jsons/{self.using_cards}/tarots.json", 
-                encoding="utf-8"  
-            ) as f:
-                self.card_map = json.load(f)
-            
-            # 加载牌阵配置
-            with open(
-                self.base_dir / "tarot_jsons/formation.json", 
-                encoding="utf-8"  
-            ) as f:
-                self.formation_map = json.load(f)
-                
-            logger.info(f"{self.log_prefix} 已加载{self.card_map['_meta']['total_cards']}张卡牌和{len(self.formation_map)}种抽牌方式")
-        except UnicodeDecodeError as e:
-            logger.error(f"{self.log_prefix} 编码错误: 请确保JSON文件为UTF-8格式 - {str(e)}")
-            raise
-        except Exception as e:
-            logger.error(f"{self.log_prefix} 资源加载失败: {str(e)}")
-            raise
+        # 初始化路径并加载卡牌数据
+        self._bind_deck(self.config["cards"].get("using_cards", 'bilibili'))
 
+    @timed("execute")
     async def execute(self) -> Tuple[bool, str]:
         """实现基类要求的入口方法"""
         try:
@@ -138,38 +1039,27 @@ class TarotsAction(BaseAction):
                 await self.send_text("不存在这样的抽牌范围")
                 return False, "参数错误"
                 
-            if formation_name not in self.formation_map:
+            # 每日一抽：每位用户每天在每个牌组固定抽到同一张牌，关闭时按单张抽取
+            daily = formation_name == DAILY_FORMATION
+            if daily and not self.config["daily"].get("enable_daily", True):
+                daily = False
+                formation_name = "单张"
+
+            if not daily and formation_name not in self.formation_map:
                 await self.send_text("不存在这样的抽牌方法")
                 return False, "参数错误"
     
             # 获取牌阵配置
-            formation = self.formation_map[formation_name] # 根据确定好的抽牌方式名称获取具体牌阵的字典
+            formation = DAILY_SPREAD if daily else self.formation_map[formation_name] # 根据确定好的抽牌方式名称获取具体牌阵的字典
             cards_num = formation["cards_num"] # 该抽牌方式要抽几张牌
             is_cut = formation["is_cut"] # 该抽牌方式要不要切牌
-            represent_list = formation["represent"] # 该抽牌方式所包含的预言方向内容
     
             # 获取有效卡牌范围
-            valid_ids = self._get_card_range(card_type)
-            if not valid_ids:
+            if cards_num > len(card_indices(card_type)):
                 await self.send_text("当前牌堆不对")
                 return False, "参数错误"
     
-            # 抽牌逻辑
-            selected_ids = random.sample(valid_ids, cards_num)
-            if is_cut:
-                selected_cards = [
-                    (cid, random.random() < 0.5)  # 切牌时50%概率逆位
-                    for cid in selected_ids
-                ]
-            else:
-                selected_cards = [
-                    (cid, False)  # 不切牌时全部正位
-                    for cid in selected_ids
-                ]
-    
             # 结果处理
-            result_text = f"【{formation_name}牌阵 - {self.using_cards}牌组】\n"
-            failed_images = []  # 记录获取失败的图片
             reply_to = self.action_data.get("target_message", None)
 
             if not reply_to:
@@ -187,54 +1077,30 @@ class TarotsAction(BaseAction):
                 return False, "reply_to格式不正确"
 
             user_nickname = parts[0].strip()
+            chat_id = self.chat_stream.stream_id if self.chat_stream else None
+            user_key = self._user_key(user_nickname)
 
-            for idx, (card_id, is_reverse) in enumerate(selected_cards):
-                card_data = self.card_map[card_id]
-                card_info = card_data["info"]
-                pos_name = represent_list[0][idx] if idx < len(represent_list[0]) else f"位置{idx+1}"
-                
-                # 轮询发送图片
-                img_data = await self._get_card_image(card_id, is_reverse)
-                if img_data:
-                    b64_data = base64.b64encode(img_data).decode('utf-8')
-                    await self.send_image(b64_data)
-                else:
-                    # 记录失败的图片
-                    failed_images.append(f"{card_data['name']}({'逆位' if is_reverse else '正位'})")
-                    logger.warning(f"{self.log_prefix} 卡牌图片获取失败: {card_id}")
-                
-                # 轮询构建文本
-                desc = card_info['reverseDescription'] if is_reverse else card_info['description']
-                result_text += (
-                    f"\n{pos_name} - {'逆位' if is_reverse else '正位'} {card_data['name']}\n"
-                    f"{desc[:100]}...\n"
-                )
-                await asyncio.sleep(0.3)  # 防止消息频率限制
+            # 抽牌逻辑：切牌时每张50%概率逆位，不切牌时全部正位；记录种子以便复现这次抽牌
+            daily_key = None
+            if daily:
+                day = fortune_day()
+                selected_cards = self._fortune_cards(user_key, day)
+                daily_key = (day, user_key, self.using_cards)
+                fortune_store.touch(user_key, day, chat_id)
+                title = f"【{DAILY_FORMATION} - {self.using_cards}牌组】"
+            else:
+                seed = self._parse_seed(self.action_data.get("seed"))
+                selected_cards = draw_reading(card_type, cards_num, is_cut, seed)
+                logger.info(f"{self.log_prefix} 抽牌种子: {seed}")
+                title = f"【{formation_name}牌阵 - {self.using_cards}牌组】"
+
+            # 先构建完整的牌面文本，解牌请求可以立刻发起
+            result_text = self._format_reading(title, formation, selected_cards)
 
-            if failed_images:
-                error_msg = f"以下卡牌图片获取失败，占卜中断: {', '.join(failed_images)}"
-                await self.send_text(error_msg)
-                return False, ""
-                
-            # 发送最终文本
-            await asyncio.sleep(1.5) # 权宜之计，给最后一张图片1.5s的发送起跑时间，无可奈何的办法
-            
-            original_text = self.config["adjustment"].get("enable_original_text", False)
             self_id = config_api.get_global_config("bot.qq_account")
 
             # 查询自己机器人本体的名字，因为可乐允许机器人自己更改自己的绰号，还一直在不断的改！
             self_person = Person(platform="qq", user_id=self_id)
-            message_text = ""
-
-            status, llm_response = await generator_api.rewrite_reply(
-                chat_stream=self.chat_stream,
-                reply_data={ 
-                "raw_reply": result_text,
-                "reason": "抽出了塔罗牌结果，请根据其内容为用户进行解牌"
-                },
-                enable_splitter=False,
-                enable_chinese_typo=False
-            ) # 让你的麦麦用自己的语言风格阐释结果
 
             # 从 action_data 获取消息内容
             processed_record_text = self.action_data.get("target_message", "") if self.action_data else ""
@@ -254,22 +1120,28 @@ class TarotsAction(BaseAction):
                     person_name = person.person_name if person.is_known else match.group(1)
                     processed_record_text = processed_record_text.replace(match.group(0), f"@{person_name}")
 
-            if original_text:
-                await self.send_text(result_text)
-                logger.info("原始文本已发送")
-
-            message_text = ""
-            if status and llm_response and llm_response.reply_set and len(llm_response.reply_set) > 0:
-                # 合并所有消息片段
-                message_text = llm_response.reply_set[0][1] if isinstance(llm_response.reply_set[0], tuple) else str(llm_response.reply_set[0])
-
-            # 一次性发送合并的消息
-            if message_text:
-                await self.send_text(message_text)
-                logger.info("合并消息已发送")
-            else:
-                await self.send_text("消息生成错误，很可能是generator炸了")
-                return False, "消息生成错误，很可能是generator炸了"
+            # 发送图片和解牌；开启合并时，同一聊天短时间内的多次抽牌会合并为一批发送
+            draw = DrawRequest(self, user_nickname, formation_name, formation, selected_cards, result_text, daily_key)
+            coalesce_config = self.config["coalesce"]
+            try:
+                # 超出并发配额或排队已满时立即回复稍后再试，不让延迟越积越高
+                async with admission.admit(user_key, chat_id):
+                    # 每日一抽的解牌按用户单独缓存，不参与合并
+                    if coalesce_config.get("enable_coalesce", False) and chat_id and not daily:
+                        success, error = await draw_coalescer.submit(
+                            chat_id,
+                            draw,
+                            window=float(coalesce_config.get("window", 1.5)),
+                            max_batch=int(coalesce_config.get("max_batch", 4)),
+                            flush=self._deliver_draws,
+                        )
+                    else:
+                        success, error = (await self._deliver_draws([draw]))[0]
+            except AdmissionRejected as e:
+                await self.send_text(str(e))
+                return False, str(e)
+            if not success:
+                return False, error
 
             # 记录动作信息
             await self.store_action_info(
@@ -286,286 +1158,223 @@ class TarotsAction(BaseAction):
             await self.send_text(f"占卜失败: {str(e)}")
             return False, "执行错误"
         
-    def _get_card_range(self, card_type: str) -> list:
-        """获取卡牌范围"""
-        if card_type == "大阿卡纳":
-            return [str(i) for i in range(22)]
-        elif card_type == "小阿卡纳":
-            return [str(i) for i in range(22, 78)]
-        return [str(i) for i in range(78)] # 既不是大阿卡纳也不是小阿卡纳就返回全部的
-    
-    async def _get_card_image(self, card_id: str, is_reverse: bool) -> Optional[bytes]:
-        """获取卡牌图片（有缓存机制）"""
+    async def _send_card_images(self, selected_cards: List[Tuple[str, bool]], formation: Mapping) -> List[str]:
+        """按顺序发送抽到的牌面图片，返回获取失败的牌面描述列表"""
+        # 拼图模式：整个牌阵合成一张图片一次发出，拼图失败时退回逐张发送
+        if self.config["composite"].get("enable_composite", False):
+            spread_data = await self._render_spread_payload(selected_cards, formation)
+            if spread_data:
+                await self._send_image_scheduled(spread_data)
+                return []
+
+        # 所有牌面并行准备，按牌阵顺序逐张发送
+        payload_tasks = [
+            asyncio.create_task(self._get_card_payload(card_id, is_reverse))
+            for card_id, is_reverse in selected_cards
+        ]
+        failed_images = []  # 记录获取失败的图片
         try:
-            filename = f"{card_id}_norm.png"
-            cache_path = self.cache_dir / filename
-            # 检查缓存文件是否存在且有效
-            if not cache_path.exists() or not self._validate_image_integrity(cache_path):
-                if cache_path.exists():
-                    logger.warning(f"{self.log_prefix} 发现损坏的缓存文件，准备重新下载: {cache_path}")
-                    try:
-                        cache_path.unlink()
-                    except Exception as e:
-                        logger.error(f"{self.log_prefix} 删除损坏文件失败: {str(e)}")
-                        return None
-                
-                # 下载图片，现在返回布尔值
-                success = await self._download_image(card_id, cache_path)
-                if not success:
-                    return None
-            
-            with open(cache_path, "rb") as f:
-                img_data = f.read()
-            
-            if is_reverse:
-                img_data = self._rotate_image(img_data) # 如果是逆位牌，直接把正位牌扭180度
-                if not img_data:  # 旋转失败
-                    return None
+            for (card_id, is_reverse), payload_task in zip(selected_cards, payload_tasks):
+                b64_data = await payload_task
+                if b64_data:
+                    await self._send_image_scheduled(b64_data)
+                else:
+                    # 记录失败的图片
+                    failed_images.append(f"{self.card_map[card_id]['name']}({'逆位' if is_reverse else '正位'})")
+                    logger.warning(f"{self.log_prefix} 卡牌图片获取失败: {card_id}")
+        finally:
+            for payload_task in payload_tasks:
+                payload_task.cancel()
+        return failed_images
 
-            return img_data
+    async def _deliver_draws(self, draws: List["DrawRequest"]) -> List[Tuple[bool, str]]:
+        """
+        发送一批抽牌结果：所有图片按到达顺序走同一条发送流水线，解牌只请求一次LLM，
+        多人时合并为一条覆盖所有人的解牌。LLM解牌与图片发送并行，文本在最后一张图片发送完成后才放出。
+        :return: 每个抽牌请求的 (是否成功, 失败原因)
+        """
+        interpretation_task = asyncio.create_task(self._interpret_batch(draws))
 
-        except Exception as e:
-            logger.warning(f"{self.log_prefix} 获取图片失败: {str(e)}")
-            return None
-        
-    def _rotate_image(self, img_data: bytes) -> Optional[bytes]:
-        """将图片旋转180度生成逆位图片"""
+        results: List[Tuple[bool, str]] = []
         try:
-            # bytes → PIL Image对象
-            image = Image.open(io.BytesIO(img_data))
-            
-            # 旋转180度（逆时针）
-            rotated_image = image.rotate(180)
-            
-            # PIL Image对象 → bytes
-            buffer = io.BytesIO()
-            rotated_image.save(buffer, format='PNG')
-            return buffer.getvalue()
-            
-        except Exception as e:
-            logger.error(f"{self.log_prefix} 图片旋转失败: {str(e)}")
-            # 旋转失败时返回None
-            return None
-        
-    async def _download_image(self, card_id: str, save_path: Path):
-        """图片本地缓存"""
-        MAX_RETRIES = 3
-        RETRY_DELAY = 2  # 初始重试间隔（秒）
+            for draw in draws:
+                failed_images = await draw.action._send_card_images(draw.selected_cards, draw.formation)
+                if failed_images:
+                    who = f"{draw.user_nickname}的" if len(draws) > 1 else ""
+                    error_msg = f"以下卡牌图片获取失败，{who}占卜中断: {', '.join(failed_images)}"
+                    await self._send_text_scheduled(error_msg)
+                    results.append((False, ""))
+                else:
+                    results.append((True, ""))
+        except BaseException:
+            interpretation_task.cancel()
+            raise
 
-        try:
-            # 获取卡牌数据
-            card_info = self.card_map[card_id]["info"]
-            img_path = card_info['imgUrl']
-            base_url = self.card_map["_meta"]["base_url"]
-            # 获取代理数据
-            enable_proxy = self.config["proxy"].get("enable_proxy", False)
-            if enable_proxy:
-                proxy_url = self.config["proxy"].get("proxy_url", "")
-            else:
-                proxy_url = None
-            
-            # 构建完整的下载URL
-            full_url = f"{base_url}{img_path}"
+        delivered = [draw for draw, (success, _) in zip(draws, results) if success]
+        if not delivered:
+            interpretation_task.cancel()
+            return results
+        if len(delivered) < len(draws):
+            # 有人的图片发送失败，提前发起的解牌包含了其牌面，只为成功发送的抽牌重新解牌
+            interpretation_task.cancel()
+            interpretation_task = asyncio.create_task(self._interpret_batch(delivered))
 
-            # 下载尝试循环
-            for attempt in range(1, MAX_RETRIES + 1):
-                try:
-                    logger.info(f"[图片下载] 尝试 {attempt}/{MAX_RETRIES} - {card_id} - {full_url}")
-                    
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(full_url, timeout=aiohttp.ClientTimeout(total=15), proxy=proxy_url) as resp:
-                            if resp.status == 200:
-                                # 确保目录存在
-                                save_path.parent.mkdir(parents=True, exist_ok=True)
-                                
-                                # 写入文件
-                                with open(save_path, "wb") as f:
-                                    f.write(await resp.read())
-                                
-                                # 立即进行完整性检测
-                                if self._validate_image_integrity(save_path):
-                                    logger.info(f"[图片下载] 成功并通过完整性检测 {save_path.name} (尝试 {attempt}次)")
-                                    return True
-                                else:
-                                    # 完整性检测失败，删除文件
-                                    logger.warning(f"[图片下载] 完整性检测失败，删除文件: {save_path}")
-                                    try:
-                                        save_path.unlink()
-                                    except Exception as delete_error:
-                                        logger.error(f"[图片下载] 删除损坏文件失败: {delete_error}")
-                                    
-                                    # 如果不是最后一次尝试，继续重试
-                                    if attempt < MAX_RETRIES:
-                                        logger.info(f"[图片下载] 完整性检测失败，准备重试 (尝试 {attempt+1}/{MAX_RETRIES})")
-                                        continue
-                                    else:
-                                        logger.error(f"[图片下载] 完整性检测失败且已达最大重试次数: {save_path}")
-                                        break
-                            else:
-                                logger.warning(f"[图片下载] 异常状态码 {resp.status} - {full_url}")
-                                
-                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                    logger.warning(f"[图片下载] 尝试 {attempt}/{MAX_RETRIES} 失败: {str(e)}")
-                    
-                # 指数退避等待
-                if attempt < MAX_RETRIES:
-                    await asyncio.sleep(RETRY_DELAY ** attempt)
+        # 发送最终文本（图片均已等待发送完成，由发送调度器控制节奏）
+        if self.config["adjustment"].get("enable_original_text", False):
+            await self._send_text_scheduled("\n\n".join(draw.result_text for draw in delivered))
+            logger.info("原始文本已发送")
 
-            # 最终失败处理
-            logger.error(f"[图片下载] 终极失败 {full_url}，已达最大重试次数 {MAX_RETRIES}")
-            return False
+        message_text = await interpretation_task
 
-        except KeyError:
-            logger.error(f"[图片下载] 致命错误：卡牌 {card_id} 不存在于card_map中")
-            return False
-        
-        except Exception as e:
-            logger.error(f"{self.log_prefix} 图片下载失败: {str(e)}")
-            return False
+        # 一次性发送合并的消息
+        if message_text:
+            await self._send_text_scheduled(message_text)
+            logger.info("合并消息已发送")
+        else:
+            await self._send_text_scheduled("消息生成错误，很可能是generator炸了")
+            return [(False, "消息生成错误，很可能是generator炸了")] * len(draws)
+        return results
 
-    def _load_config(self) -> Dict[str, Any]:
-        """从同级目录的config.toml文件直接加载配置"""
-        try:
-            # 获取当前文件所在目录
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            config_path = os.path.join(script_dir, "config.toml")
-            
-            # 读取并解析TOML配置文件
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config_data = toml.load(f)
-            
-            # 构建配置字典，使用get方法安全访问嵌套值
-            config = {
-                "permissions": {
-                    "admin_users": config_data.get("permissions", {}).get("admin_users", [])
-                },
-                "proxy": {
-                    "enable_proxy": config_data.get("proxy", {}).get("enable_proxy", False),
-                    "proxy_url": config_data.get("proxy", {}).get("proxy_url", "")
-                },
-                "cards": {
-                    "using_cards": config_data.get("cards", {}).get("using_cards", 'bilibili'),
-                    "use_cards": config_data.get("cards", {}).get("use_cards", ['bilibili','east'])
-                },
-                "adjustment": {
-                    "enable_original_text": config_data.get("adjustment", {}).get("enable_original_text", False)
-                }
-            }
-            return config
-        except Exception as e:
-            logger.error(f"{self.log_prefix} 加载配置失败: {e}")
-            raise
+    async def _interpret_batch(self, draws: List[DrawRequest]) -> str:
+        """一批抽牌的解牌：单次抽牌走解牌缓存，多人时合并为一次覆盖所有人的LLM请求"""
+        if len(draws) == 1:
+            return await self._interpret_draw(draws[0])
+        combined_text = "\n\n".join(f"【为{draw.user_nickname}抽的牌】\n{draw.result_text}" for draw in draws)
+        return await self._rewrite_interpretation(
+            combined_text, reason="为多位用户分别抽出了塔罗牌结果，请根据其内容分别为每一位用户解牌"
+        )
 
-    def _validate_image_integrity(self, file_path: Path) -> bool:
-        """检查图片文件完整性"""
+    async def _interpret_draw(self, draw: DrawRequest) -> str:
+        """单次抽牌的解牌；每日一抽优先使用当天预先生成（或当天已生成过）的解牌"""
+        if draw.daily_key is None:
+            return await self._generate_interpretation(draw.result_text, draw.formation_name, draw.selected_cards)
+        message_text = fortune_store.get_reading(*draw.daily_key)
+        if message_text:
+            metrics.incr("daily.hit")
+            return message_text
+        metrics.incr("daily.miss")
+        message_text = await self._rewrite_interpretation(draw.result_text)
+        fortune_store.put_reading(*draw.daily_key, message_text)
+        return message_text
+
+    def _parse_seed(self, value: Any) -> int:
+        """解析请求指定的抽牌种子，未指定或无法解析时生成新的种子"""
+        if value is None:
+            return new_seed()
         try:
-            # 检查文件是否存在
-            if not file_path.exists():
-                logger.debug(f"{self.log_prefix} 图片文件不存在: {file_path}")
-                return False
-            
-            # 检查文件大小（至少要有内容，不能是0字节）
-            if file_path.stat().st_size == 0:
-                logger.warning(f"{self.log_prefix} 图片文件为空: {file_path}")
-                return False
-            
-            # 尝试使用PIL打开图片来验证完整性
-            try:
-                with Image.open(file_path) as img:
-                    # 验证图片基本信息
-                    if img.size[0] <= 0 or img.size[1] <= 0:
-                        logger.warning(f"{self.log_prefix} 图片尺寸异常: {file_path}")
-                        return False
-                    
-                    # 尝试加载图片数据以确保文件没有损坏
-                    img.load()
-                    logger.debug(f"{self.log_prefix} 图片完整性校验通过: {file_path}")
-                    return True
-                    
-            except (Image.UnidentifiedImageError, OSError, IOError) as e:
-                logger.warning(f"{self.log_prefix} 图片损坏或格式错误: {file_path} - {str(e)}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"{self.log_prefix} 图片完整性校验异常: {file_path} - {str(e)}")
-            return False
-        
-    def get_available_card_type(self, user_requested_type):
-        """获取当前牌组支持的卡牌类型"""
-        supported_type = self.card_map.get("_meta", {}).get("card_types", "")
-        # 如果牌组支持全部，或者用户请求与牌组支持的一致，就用用户请求的
-        if supported_type == '全部' or user_requested_type == supported_type:
-            return user_requested_type
-        else:
-            # 否则用牌组支持的类型
-            return supported_type
-        
+            return int(value)
+        except (TypeError, ValueError):
+            logger.warning(f"{self.log_prefix} 抽牌种子无效，改用随机种子: {value!r}")
+            return new_seed()
+
+    def _user_key(self, user_nickname: str) -> str:
+        """用户标识（用于每日一抽和并发配额）：优先使用平台用户ID，取不到时才退回LLM提取的昵称"""
+        user_id = getattr(self, "user_id", None)
+        if user_id:
+            return f"{getattr(self, 'platform', None) or 'qq'}:{user_id}"
+        return f"name:{user_nickname}"
+
+    async def _generate_interpretation(
+        self, result_text: str, formation_name: str, selected_cards: List[Tuple[str, bool]]
+    ) -> str:
+        """获取解牌文本：同一牌组、牌阵和牌面组合已缓存足够多的解读时直接取用，否则请求LLM并登记"""
+        interpretation_config = self.config["interpretation"]
+        if not interpretation_config.get("enable_cache", False):
+            return await self._rewrite_interpretation(result_text)
+
+        db_path = self.base_dir / "tarots_cache" / "interpretations.db" if interpretation_config.get("persist", False) else None
+        interpretation_cache.configure(
+            max_entries=int(interpretation_config.get("max_entries", 2000)),
+            ttl=float(interpretation_config.get("ttl_hours", 24)) * 3600,
+            variants=int(interpretation_config.get("variants", 3)),
+            db_path=db_path,
+        )
+        key = interpretation_key(
+            self.using_cards, formation_name, selected_cards, str(interpretation_config.get("style_version", "1"))
+        )
+        cached = await worker_pool.run_io(interpretation_cache.get, key)
+        if cached:
+            metrics.incr("interpretation.hit")
+            return cached
+
+        metrics.incr("interpretation.miss")
+        message_text = await self._rewrite_interpretation(result_text)
+        if message_text:
+            await worker_pool.run_io(interpretation_cache.put, key, message_text)
+        return message_text
+
+    async def _wait_send_slot(self):
+        """按全局和本聊天流的令牌桶限速，等待下一次发送的时机"""
+        send_config = self.config["send"]
+        send_scheduler.configure(
+            global_rate=float(send_config.get("global_rate", 5.0)),
+            global_burst=float(send_config.get("global_burst", 10)),
+            chat_rate=float(send_config.get("chat_rate", 2.0)),
+            chat_burst=float(send_config.get("chat_burst", 3)),
+        )
+        await send_scheduler.acquire(self.chat_stream.stream_id if self.chat_stream else None)
+
+    async def _send_image_scheduled(self, b64_data: str):
+        """经发送调度器限速后发送图片，并等待发送完成以保证顺序"""
+        with metrics.span("send_wait"):
+            await self._wait_send_slot()
+        with metrics.span("send_image"):
+            await self.send_image(b64_data)
+        metrics.incr("bytes.image_sent", len(b64_data))
+
+    async def _send_text_scheduled(self, text: str):
+        """经发送调度器限速后发送文本，并等待发送完成以保证顺序"""
+        with metrics.span("send_wait"):
+            await self._wait_send_slot()
+        with metrics.span("send_text"):
+            await self.send_text(text)
+        metrics.incr("bytes.text_sent", len(text.encode("utf-8")))
+
     def _update_available_card_sets(self):
-        """更新配置文件中的可用牌组列表"""
+        """更新配置文件中的可用牌组列表（仅在列表实际变化时写入）"""
         try:
             current_using = self.config["cards"].get("using_cards", "")
             available_sets = self._scan_available_card_sets()
+            changed = False
 
             # 如果当前使用的牌组不存在于可用牌组中
             if not current_using or current_using not in available_sets:
                 # 尝试从可用牌组中选择一个有效的
                 new_using = available_sets[0] if available_sets else ""
             
-                logger.warning(
-                    f"当前使用牌组 '{current_using}' 不存在，已自动切换至 '{new_using}'"
-                    )
-            
                 # 更新当前使用牌组
-                self.set_card(new_using)
+                if self.set_card(new_using):
+                    changed = True
+                    logger.warning(
+                        f"当前使用牌组 '{current_using}' 不存在，已自动切换至 '{new_using}'"
+                        )
 
             if available_sets:
-                self.set_cards(available_sets)
-                logger.info(f"已更新可用牌组配置: {available_sets}")
+                if self.set_cards(available_sets):
+                    changed = True
+                    logger.info(f"已更新可用牌组配置: {available_sets}")
             else:
                 logger.error("未发现任何可用牌组")
-                self.set_card("")
-                self.set_cards([])
+                changed = self.set_card("") or changed
+                changed = self.set_cards([]) or changed
                 
-            self.config = self._load_config()
+            if changed:
+                self.config = self._load_config()
         except Exception as e:
             logger.error(f"更新牌组配置失败: {e}")
         
     def _scan_available_card_sets(self) -> List[str]:
         """扫描tarot_jsons文件夹，返回可用牌组列表"""
         try:
-            tarot_jsons_dir = self.base_dir / "tarot_jsons"
-            available_sets = []
-            
-            if not tarot_jsons_dir.exists():
-                logger.warning(f"tarot_jsons目录不存在: {tarot_jsons_dir}")
-                return []
-            
-            for item in tarot_jsons_dir.iterdir():
-                if item.is_dir():
-                    tarots_json_path = item / "tarots.json"
-                    if tarots_json_path.exists():
-                        available_sets.append(item.name)
-                        logger.info(f"发现可用牌组: {item.name}")
-            
-            return available_sets
+            return deck_registry.available_decks()
         except Exception as e:
             logger.error(f"扫描牌组失败: {e}")
             return []
         
-    def set_cards(self, cards: List):
-        """使用tomlkit修改配置文件，保持注释和格式"""
+    def set_cards(self, cards: List) -> bool:
+        """修改可用牌组列表，延迟合并后用tomlkit原子写回配置文件，保持注释和格式"""
         try:
-            config_path = os.path.join(self.base_dir, "config.toml")
-            
-            # 使用tomlkit读取，保持格式和注释
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config_data = tomlkit.load(f)
-                config_data.setdefault("cards", {})["use_cards"] = cards
-            
-            # 使用tomlkit写入，保持格式和注释
-            with open(config_path, 'w', encoding='utf-8') as f:
-                tomlkit.dump(config_data, f)
-                
+            return config_store.set_value("cards", "use_cards", list(cards))
         except Exception as e:
             logger.error(f"{self.log_prefix} 扫描牌组失败: {e}")
             raise
@@ -579,20 +1388,10 @@ class TarotsAction(BaseAction):
             return False
         return cards in use_cards
     
-    def set_card(self, cards: str):
-        """使用tomlkit修改配置文件，保持注释和格式"""
+    def set_card(self, cards: str) -> bool:
+        """修改当前使用牌组，延迟合并后用tomlkit原子写回配置文件，保持注释和格式"""
         try:
-            config_path = os.path.join(self.base_dir, "config.toml")
-            
-            # 使用tomlkit读取，保持格式和注释
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config_data = tomlkit.load(f)
-                config_data.setdefault("cards", {})["using_cards"] = cards
-            
-            # 使用tomlkit写入，保持格式和注释
-            with open(config_path, 'w', encoding='utf-8') as f:
-                tomlkit.dump(config_data, f)
-                
+            return config_store.set_value("cards", "using_cards", cards)
         except Exception as e:
             logger.error(f"{self.log_prefix} 更新配置文件失败: {e}")
             raise
@@ -606,9 +1405,22 @@ class TarotsCommand(BaseCommand, TarotsAction):
     command_name = "tarots_command"
     command_description = "塔罗牌命令，目前仅做缓存"
     command_pattern = r"^/tarots\s+(?P<target_type>\w+)(?:\s+(?P<action_value>\w+))?\s*$"
-    command_help = "使用方法: /tarots cache - 缓存所有牌面;/tarots switch 牌组名称 - 切换当前使用的牌组"
+    command_help = "使用方法: /tarots cache - 缓存所有牌面;/tarots cache all - 缓存所有可用牌组的牌面;/tarots cache refresh - 向图片源校验并更新有变化的牌面;/tarots warmup - 查看后台缓存预热进度;/tarots warmup start - 立即开始后台缓存预热;/tarots warmup stop - 停止后台缓存预热;/tarots stats - 查看各阶段耗时统计;/tarots stats reset - 清空耗时统计;/tarots mirrors - 查看当前牌组图片源的排名;/tarots pack - 把当前牌组打包为单个牌组包文件;/tarots unpack - 把当前牌组的牌组包还原为散装文件;/tarots daily - 查看每日一抽预计算状态;/tarots daily start - 立即为活跃用户预计算今天的每日一抽;/tarots simulate 次数 - 模拟大量抽牌检验分布是否均匀;/tarots switch 牌组名称 - 切换当前使用的牌组"
     command_examples = [
         "/tarots cache - 开始缓存全部牌面",
+        "/tarots cache all - 开始缓存所有可用牌组的全部牌面",
+        "/tarots cache refresh - 向图片源校验当前牌组，只下载有更新的牌面",
+        "/tarots warmup - 查看后台缓存预热进度",
+        "/tarots warmup start - 立即开始后台缓存预热",
+        "/tarots warmup stop - 停止后台缓存预热",
+        "/tarots stats - 查看各阶段耗时、缓存命中率和发送量统计",
+        "/tarots stats reset - 清空耗时统计",
+        "/tarots mirrors - 查看当前牌组各图片源的耗时、成功率和排名",
+        "/tarots pack - 缓存并把当前牌组打包为单个牌组包文件",
+        "/tarots unpack - 把当前牌组的牌组包还原为散装文件",
+        "/tarots daily - 查看每日一抽预计算状态和活跃用户数",
+        "/tarots daily start - 立即为活跃用户预计算今天的每日一抽",
+        "/tarots simulate 1000000 - 模拟一百万次抽牌，检验各牌出现频率和逆位比例",
         "/tarots switch 牌组名称 - 切换当前使用的牌组"
     ]
     enable_command = True
@@ -619,15 +1431,7 @@ class TarotsCommand(BaseCommand, TarotsAction):
         self.base_dir = Path(__file__).parent.absolute()
         self.config = self._load_config()
         self._update_available_card_sets()
-        self.using_cards = self.config["cards"].get("using_cards", 'bilibili')
-        if not self.using_cards:
-            self.cache_dir = self.base_dir / "tarots_cache" / "default"
-        else:
-            self.cache_dir = self.base_dir / "tarots_cache" / self.using_cards
-            self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self.card_map = {}
-        self.formation_map = {}
-        self._load_resources()
+        self._bind_deck(self.config["cards"].get("using_cards", 'bilibili'))
 
     async def execute(self) -> Tuple[bool, Optional[str]]:
         try:
@@ -654,63 +1458,137 @@ class TarotsCommand(BaseCommand, TarotsAction):
                 return False, "没有牌组，无法使用"
             target_type = self.matched_groups.get("target_type")
             action_value = self.matched_groups.get("action_value")
-            support_type = self.get_available_card_type("全部")
-            if support_type == '全部':
-                check_count=[str(i) for i in range(78)]
-            elif support_type == '大阿卡纳':
-                check_count=[str(i) for i in range(22)]
-            elif support_type == '小阿卡纳':
-                check_count=[str(i) for i in range(22,78)]
-            else:
+            check_count = self._get_cacheable_ids()
+            if check_count is None:
                 await self.send_text("这不在可用牌组中") 
                 return False, "非可用牌组"
             
-            if target_type == "cache" and not action_value:
-                
+            if target_type == "cache" and (not action_value or action_value in ("all", "refresh")):
+                refresh = action_value == "refresh"
+                cache_started = time.perf_counter()
+                download_config = self.config["download"]
+                concurrency = int(download_config.get("concurrency", 8))
+                progress_interval = float(download_config.get("progress_interval", 10))
+
+                # 需要缓存的牌组，all 表示全部可用牌组
+                cachers: List[TarotsCacheMixin] = [self]
+                if action_value == "all":
+                    for deck in self.config["cards"].get("use_cards", []):
+                        if deck == self.using_cards:
+                            continue
+                        try:
+                            cachers.append(TarotsDeckCacher(deck, self.config, self.log_prefix))
+                        except Exception as e:
+                            logger.warning(f"{self.log_prefix} 牌组 {deck} 加载失败，跳过缓存: {e}")
+
                 # 添加进度提示
-                await self.send_text("开始缓存全部牌面，请稍候...")
-                success_count = 0
-                redownload_count = 0  # 记录重新下载的数量
-                
-                for card in check_count:
-                    try:
-                        filename = f"{card}_norm.png"
-                        cache_path = self.cache_dir / filename
-
-                        # 检查文件是否存在且完整
-                        if not cache_path.exists() or not self._validate_image_integrity(cache_path):
-                            if cache_path.exists():
-                                # 文件存在但损坏，记录重新下载
-                                logger.warning(f"{self.log_prefix} 发现损坏的缓存文件，准备重新下载: {cache_path}")
-                                redownload_count += 1
-                                try:
-                                    cache_path.unlink()  # 删除损坏的文件
-                                except Exception as e:
-                                    logger.error(f"{self.log_prefix} 删除损坏文件失败: {str(e)}")
-                                    continue
-                            
-                            # 下载图片
-                            download_success = await self._download_image(card, cache_path)
-                            if download_success:
-                                success_count += 1
-                            else:
-                                logger.warning(f"{self.log_prefix} 下载卡牌 {card} 失败")
-                        else:
-                            # 文件存在且完整
-                            success_count += 1
-
-                    except Exception as e:
-                        logger.warning(f"{self.log_prefix} 缓存卡牌 {card} 失败: {str(e)}")
-                        continue 
+                deck_names = "、".join(cacher.using_cards for cacher in cachers)
+                if refresh:
+                    await self.send_text(f"开始向图片源校验{deck_names}牌组的全部牌面，只会下载有更新的图片，请稍候...")
+                else:
+                    await self.send_text(f"开始缓存{deck_names}牌组的全部牌面，请稍候...")
+
+                async def cache_deck(cacher: TarotsCacheMixin) -> str:
+                    card_ids = cacher._get_cacheable_ids()
+                    if card_ids is None:
+                        return f"{cacher.using_cards}：牌组类型未知，已跳过"
+
+                    async def report(done: int, total: int):
+                        await self.send_text(f"{cacher.using_cards}牌组缓存中：{done}/{total}")
+
+                    success_count, redownload_count = await cacher._cache_cards(
+                        card_ids,
+                        concurrency=concurrency,
+                        on_progress=report,
+                        progress_interval=progress_interval,
+                        refresh=refresh,
+                    )
+                    deck_msg = f"{cacher.using_cards}：成功缓存 {success_count}/{len(card_ids)} 张牌面"
+                    if refresh:
+                        deck_msg += f"，其中 {redownload_count} 张在图片源有更新并已重新下载"
+                    elif redownload_count > 0:
+                        deck_msg += f"，其中重新下载了 {redownload_count} 张损坏的图片"
+                    return deck_msg
+
+                # 所有牌组共用插件的HTTP连接池，由连接池上限控制全局并发连接数
+                deck_results = await asyncio.gather(*(cache_deck(cacher) for cacher in cachers))
+
+                metrics.record("cache_refresh" if refresh else "cache_command", time.perf_counter() - cache_started)
 
                 # 构建结果消息
-                result_msg = f"缓存完成，成功缓存 {success_count}/{len(check_count)} 张牌面"
-                if redownload_count > 0:
-                    result_msg += f"，其中重新下载了 {redownload_count} 张损坏的图片"
+                result_msg = "缓存完成，" + "；".join(deck_results)
                 
                 await self.send_text(result_msg)
                 return True, result_msg
             
+            elif target_type == "warmup" and (not action_value or action_value in ("start", "stop")):
+                if action_value == "start":
+                    if not cache_warmer.start(delay=0):
+                        await self.send_text("缓存预热已在进行中")
+                        return False, "缓存预热已在进行中"
+                    await self.send_text("已在后台开始缓存预热，可使用 /tarots warmup 查看进度")
+                    return True, "已开始缓存预热"
+                if action_value == "stop":
+                    cache_warmer.cancel()
+                status_msg = cache_warmer.status_text()
+                await self.send_text(status_msg)
+                return True, status_msg
+
+            elif target_type == "stats" and (not action_value or action_value == "reset"):
+                if action_value == "reset":
+                    metrics.reset()
+                    await self.send_text("已清空耗时统计")
+                    return True, "已清空耗时统计"
+                payload_stats = payload_cache.stats()
+                lookups = payload_stats["hits"] + payload_stats["misses"]
+                extra = {
+                    "内存图片缓存": f"{payload_stats['entries']}项 {payload_stats['bytes'] / 1024 / 1024:.1f}/{payload_stats['max_bytes'] / 1024 / 1024:.0f}MB",
+                }
+                if lookups:
+                    extra["内存图片缓存命中率"] = f"{payload_stats['hits'] / lookups:.1%}（{payload_stats['hits']}/{lookups}）"
+                interpretation_stats = interpretation_cache.stats()
+                interpretation_lookups = interpretation_stats["hits"] + interpretation_stats["misses"]
+                if interpretation_lookups:
+                    extra["解牌缓存命中率"] = (
+                        f"{interpretation_stats['hits'] / interpretation_lookups:.1%}"
+                        f"（{interpretation_stats['hits']}/{interpretation_lookups}，{interpretation_stats['keys']}种组合）"
+                    )
+                stats_msg = "\n".join(metrics.format_lines(extra) + admission.status_lines())
+                await self.send_text(stats_msg)
+                return True, stats_msg
+
+            elif target_type == "mirrors" and not action_value:
+                mirrors = deck_mirrors(self.card_map["_meta"], self.using_cards, self.config["download"].get("mirrors", []))
+                mirrors_msg = f"{self.using_cards}牌组的图片源（按优先级）：\n" + "\n".join(mirror_selector.describe(mirrors))
+                await self.send_text(mirrors_msg)
+                return True, mirrors_msg
+
+            elif target_type == "pack" and not action_value:
+                await self.send_text(f"开始打包{self.using_cards}牌组，缺失的牌面会先下载，请稍候...")
+                result_msg = await self._pack_deck()
+                await self.send_text(result_msg)
+                return True, result_msg
+
+            elif target_type == "unpack" and not action_value:
+                result_msg = await self._unpack_deck()
+                await self.send_text(result_msg)
+                return True, result_msg
+
+            elif target_type == "daily" and (not action_value or action_value == "start"):
+                if action_value == "start":
+                    await self.send_text("开始为活跃用户预计算今天的每日一抽，请稍候...")
+                    prepared, total = await fortune_precomputer.run_once()
+                    result_msg = f"已为 {prepared}/{total} 位活跃用户准备好今天的每日一抽"
+                else:
+                    result_msg = fortune_precomputer.status_text()
+                await self.send_text(result_msg)
+                return True, result_msg
+
+            elif target_type == "simulate" and action_value and action_value.isdigit():
+                result_msg = await self._simulate_draws(int(action_value))
+                await self.send_text(result_msg)
+                return True, result_msg
+
             elif target_type == "switch" and action_value:
                 cards = self._check_cards(action_value)
                 if cards:
@@ -722,7 +1600,7 @@ class TarotsCommand(BaseCommand, TarotsAction):
                     return False, f"{action_value}并不在当前可用牌组里"
 
             else:
-                await self.send_text("没有这种参数，只能填cache或者switch哦")
+                await self.send_text("没有这种参数，只能填cache、warmup、stats、mirrors、pack、unpack、daily、simulate或者switch哦")
                 return False, "没有这种参数"
 
         except Exception as e:
@@ -730,6 +1608,78 @@ class TarotsCommand(BaseCommand, TarotsAction):
             logger.error(f"{self.log_prefix} 命令执行错误: {e}")
             return False, f"执行失败: {str(e)}"
         
+    async def _simulate_draws(self, draws: int) -> str:
+        """模拟大量单张抽牌（含逆位），检验当前牌组抽牌范围内各牌出现的频率是否均匀"""
+        card_type = self.get_available_card_type("全部")
+        result = await worker_pool.run_cpu(simulate, card_type, 1, draws)
+        (low_id, low_dev), (high_id, high_dev) = result.extremes()
+
+        def card_name(card_id: int) -> str:
+            return self.card_map.get(str(card_id), {}).get("name", str(card_id))
+
+        lines = [
+            f"模拟抽牌 {result.draws} 次（{card_type}，{result.engine}），用时 {result.seconds:.2f}秒",
+            f"逆位比例: {result.reversed_total / (result.draws * result.count):.4%}",
+            f"出现最少: {card_name(low_id)} {low_dev:+.3%}，出现最多: {card_name(high_id)} {high_dev:+.3%}",
+            f"卡方 {result.chi_square:.1f}（自由度{result.dof}），p≈{result.p_value:.3f}"
+            + ("，分布均匀" if result.p_value >= 0.01 else "，分布可能不均匀"),
+        ]
+        if result.draws < draws:
+            lines.append(f"模拟次数已限制为{result.draws}次" + ("（未安装NumPy）" if result.engine != "NumPy" else ""))
+        return "\n".join(lines)
+
+    async def _pack_deck(self) -> str:
+        """缓存当前牌组的全部牌面和派生图片，并打包为单个牌组包"""
+        card_ids = self._get_cacheable_ids()
+        download_config = self.config["download"]
+        success_count, _ = await self._cache_cards(card_ids, concurrency=int(download_config.get("concurrency", 8)))
+        if success_count < len(card_ids):
+            return f"有{len(card_ids) - success_count}张牌面缓存失败，已取消打包，请稍后重试"
+
+        # 原图、逆位图和当前规格的发送用图片都收进包内
+        profile = self._get_transport_profile()
+        images = []
+        for card_id in card_ids:
+            for is_reverse in (False, True):
+                orientation = "rev" if is_reverse else "norm"
+                path = self.deck_cache.image_path(card_id, is_reverse)
+                if is_reverse:
+                    # 逆位图片缺失或过期时重新生成，仍失败则不收进包内，发送时再按需生成
+                    path = await self._ensure_reversed_image(card_id)
+                    if path is None:
+                        logger.warning(f"{self.log_prefix} 卡牌 {card_id} 的逆位图片不可用，打包时跳过")
+                if path is not None:
+                    images.append(((card_id, orientation, "original"), path, path.name))
+                if profile:
+                    path = self.deck_cache.transport_path(card_id, is_reverse, profile)
+                    if path.exists():
+                        images.append(((card_id, orientation, profile.key), path, path.relative_to(self.cache_dir).as_posix()))
+
+        pack_path = deck_registry.pack_path(self.using_cards)
+        deck_data = deck_registry.get_deck(self.using_cards)
+        formations = deck_registry.get_formations(self.using_cards)
+        # 替换前先解除旧包的映射（Windows下被映射的文件无法替换）
+        deck_registry.invalidate(self.using_cards)
+        count = await worker_pool.run_io(build_pack, pack_path, self.using_cards, deck_data, formations, images)
+        deck_registry.invalidate(self.using_cards)
+        size_mb = pack_path.stat().st_size / 1024 / 1024
+        logger.info(f"{self.log_prefix} 已打包牌组 {self.using_cards}: {count}张图片, {size_mb:.1f}MB")
+        return f"打包完成：{self.using_cards}牌组共{count}张图片（{size_mb:.1f}MB），之后将优先从牌组包读取"
+
+    async def _unpack_deck(self) -> str:
+        """把当前牌组的牌组包还原为 tarots.json 和散装缓存图片，并删除牌组包"""
+        pack = deck_registry.get_pack(self.using_cards)
+        if pack is None:
+            return f"{self.using_cards}牌组没有牌组包"
+        count = await worker_pool.run_io(unpack_images, pack, self.cache_dir)
+        deck_path = deck_registry.deck_path(self.using_cards)
+        if not deck_path.exists():
+            await worker_pool.run_io(atomic_write_text, deck_path, json.dumps(pack.deck, ensure_ascii=False, indent=4))
+        deck_registry.invalidate(self.using_cards)
+        discard_file(deck_registry.pack_path(self.using_cards))
+        logger.info(f"{self.log_prefix} 已解包牌组 {self.using_cards}: {count}张图片")
+        return f"解包完成：{self.using_cards}牌组已还原{count}张图片，之后将使用散装文件"
+
     def _check_person_permission(self, person_id: str) -> bool:
         """权限检查逻辑
         
@@ -748,6 +1698,50 @@ class TarotsCommand(BaseCommand, TarotsAction):
             
         return person_id in admin_users
 
+class TarotsStartHandler(BaseEventHandler):
+    """麦麦启动时按配置在后台预热牌面缓存，不阻塞启动流程"""
+
+    event_type = EventType.ON_START
+    handler_name = "tarots_start_handler"
+    handler_description = "后台预热塔罗牌牌面缓存"
+    weight = 0
+    intercept_message = False
+
+    async def execute(self, message) -> Tuple[bool, bool, Optional[str]]:
+        try:
+            config = cache_warmer._load_config()
+            if config["warmup"].get("enable_warmup", False):
+                cache_warmer.start()
+                logger.info("已安排后台缓存预热")
+            if config["daily"].get("enable_daily", True) and config["daily"].get("enable_precompute", False):
+                fortune_precomputer.start()
+                logger.info("已安排每日一抽定时预计算")
+        except Exception as e:
+            logger.error(f"启动后台任务失败: {e}")
+        return True, True, None
+
+class TarotsStopHandler(BaseEventHandler):
+    """麦麦关闭时释放插件持有的网络连接和工作池"""
+
+    event_type = EventType.ON_STOP
+    handler_name = "tarots_stop_handler"
+    handler_description = "关闭塔罗牌插件共享的HTTP连接池"
+    weight = 0
+    intercept_message = False
+
+    async def execute(self, message) -> Tuple[bool, bool, Optional[str]]:
+        cache_warmer.cancel()
+        fortune_precomputer.cancel()
+        # 把延迟合并的写入立即落盘，避免关闭前的修改（例如切换牌组）丢失
+        config_store.flush()
+        save_all_manifests()
+        mirror_selector.save()
+        fortune_store.save()
+        interpretation_cache.close()
+        await http_client.close()
+        worker_pool.shutdown()
+        return True, True, None
+
 @register_plugin
 class TarotsPlugin(BasePlugin):
     """塔罗牌插件
@@ -773,6 +1767,18 @@ class TarotsPlugin(BasePlugin):
         "proxy": "代理设置（支持热重载）",
         "cards": "牌组相关设置（支持热重载）",
         "adjustment": "功能微调向（支持热重载）",
+        "transport": "发送图片压缩设置（支持热重载）",
+        "download": "图片下载设置（支持热重载）",
+        "cache": "内存缓存设置（支持热重载）",
+        "admission": "并发与排队限制设置（支持热重载）",
+        "warmup": "启动时后台缓存预热设置",
+        "stats": "耗时统计设置（支持热重载）",
+        "interpretation": "解牌结果缓存设置（支持热重载）",
+        "coalesce": "同一聊天连续抽牌的合并设置（支持热重载）",
+        "daily": "每日一抽设置",
+        "performance": "图片处理工作池设置（支持热重载）",
+        "composite": "牌阵拼图设置（支持热重载）",
+        "send": "消息发送限速设置（支持热重载）",
         "permissions": "管理者用户配置（支持热重载）",
         "logging": "日志记录配置",
     }
@@ -798,6 +1804,79 @@ class TarotsPlugin(BasePlugin):
         "adjustment":{
             "enable_original_text": ConfigField(type=bool, default=False, description="是否启用塔罗牌原始文本，开启该功能可以额外发出初始的解牌文本")
         },
+        "transport":{
+            "enable_transport": ConfigField(type=bool, default=True, description="是否发送压缩后的牌面图片，原图保留在缓存中用于重新生成"),
+            "max_dimension": ConfigField(type=int, default=1024, description="发送图片长边的最大像素"),
+            "image_format": ConfigField(type=str, default="JPEG", description="发送图片的编码格式", choices=["JPEG", "WEBP", "PNG"]),
+            "quality": ConfigField(type=int, default=85, description="发送图片的编码质量（1-95，PNG忽略此项）"),
+            "max_kb": ConfigField(type=int, default=512, description="单张发送图片的大小上限（KB），超出时自动降低质量和尺寸，0为不限制")
+        },
+        "download":{
+            "concurrency": ConfigField(type=int, default=8, description="缓存指令中每个牌组同时下载的图片数"),
+            "max_connections": ConfigField(type=int, default=16, description="插件共享连接池的最大并发连接数（所有下载共用）"),
+            "per_host_connections": ConfigField(type=int, default=8, description="连接池对同一图片源主机的最大并发连接数"),
+            "progress_interval": ConfigField(type=int, default=10, description="缓存指令汇报进度的间隔（秒）"),
+            "mirrors": ConfigField(type=List, default=[], description="额外的图片镜像，{deck}会替换为牌组名，可以是http地址或本地目录，例如 'http://127.0.0.1:8080/{deck}/' 或 'D:/tarot/{deck}/'"),
+            "hedge_delay": ConfigField(type=float, default=3.0, description="单个镜像超过多少秒未完成时同时向下一个镜像请求，0为只在失败时切换")
+        },
+        "cache":{
+            "payload_cache_mb": ConfigField(type=int, default=32, description="内存中缓存已编码图片的总大小上限（MB），重复抽到的牌无需再读盘和编码，0为关闭")
+        },
+        "daily":{
+            "enable_daily": ConfigField(type=bool, default=True, description="是否启用每日一抽：同一用户每天在同一牌组固定抽到同一张牌，当天再次抽取会复用已生成的解牌（支持热重载）"),
+            "enable_precompute": ConfigField(type=bool, default=False, description="是否每天在闲时为最近活跃的用户预先准备当天的每日一抽（需要重启生效）"),
+            "precompute_hour": ConfigField(type=int, default=5, description="每天几点（本地时间）进行预计算，应早于群友集中抽取的时间"),
+            "active_days": ConfigField(type=int, default=7, description="最近多少天内用过每日一抽的用户算作活跃用户"),
+            "pregenerate_interpretation": ConfigField(type=bool, default=False, description="预计算时是否同时预先生成解牌（会在闲时调用LLM）")
+        },
+        "coalesce":{
+            "enable_coalesce": ConfigField(type=bool, default=False, description="是否合并同一聊天短时间内的多次抽牌：图片依次发送，解牌合并为一次LLM调用、一条消息"),
+            "window": ConfigField(type=float, default=1.5, description="合并窗口（秒），第一次抽牌会等待这么久收集后续的抽牌"),
+            "max_batch": ConfigField(type=int, default=4, description="一批最多合并的抽牌数，攒满后立即发送")
+        },
+        "interpretation":{
+            "enable_cache": ConfigField(type=bool, default=False, description="是否缓存解牌结果，相同牌组、牌阵和牌面组合的热门结果不再调用LLM（缓存的解读可能沿用其他聊天中的措辞）"),
+            "variants": ConfigField(type=int, default=3, description="每种牌面组合保留的不同解读数，凑满之前仍会调用LLM生成新解读，凑满后随机取用"),
+            "ttl_hours": ConfigField(type=float, default=24, description="缓存的解读多少小时后失效，0为永不失效"),
+            "max_entries": ConfigField(type=int, default=2000, description="内存中最多缓存的牌面组合数"),
+            "persist": ConfigField(type=bool, default=False, description="是否把解牌缓存保存到tarots_cache/interpretations.db，重启后仍然有效"),
+            "style_version": ConfigField(type=str, default="1", description="人设/风格版本，修改麦麦人设后改动此值即可让旧的解读全部失效")
+        },
+        "stats":{
+            "window": ConfigField(type=int, default=512, description="每个阶段保留最近多少次耗时用于计算p50/p95/p99"),
+            "log_interval": ConfigField(type=int, default=0, description="每隔多少秒在日志中输出一行各阶段耗时统计，0为关闭")
+        },
+        "warmup":{
+            "enable_warmup": ConfigField(type=bool, default=False, description="是否在麦麦启动后于后台补齐牌面缓存，首次抽牌不再等待下载"),
+            "all_decks": ConfigField(type=bool, default=False, description="是否预热所有可用牌组，关闭时只预热当前使用的牌组"),
+            "concurrency": ConfigField(type=int, default=2, description="预热时同时处理的图片数，保持较低以免挤占实时抽牌"),
+            "start_delay": ConfigField(type=int, default=30, description="麦麦启动后等待多少秒再开始预热")
+        },
+        "admission":{
+            "max_active": ConfigField(type=int, default=8, description="同时进行的占卜数上限，0为不限制"),
+            "max_queue": ConfigField(type=int, default=16, description="达到上限后最多排队等待的占卜数，排队已满时直接回复稍后再试"),
+            "queue_timeout": ConfigField(type=float, default=20, description="排队超过多少秒放弃并回复稍后再试，0为一直等待"),
+            "per_user": ConfigField(type=int, default=2, description="同一用户同时进行（含排队）的占卜数上限，0为不限制"),
+            "per_chat": ConfigField(type=int, default=4, description="同一聊天同时进行（含排队）的占卜数上限，0为不限制"),
+            "download_concurrency": ConfigField(type=int, default=8, description="全插件同时下载的图片数上限，0为不限制"),
+            "image_concurrency": ConfigField(type=int, default=4, description="全插件同时进行的图片解码/处理数上限，0为不限制"),
+            "llm_concurrency": ConfigField(type=int, default=4, description="全插件同时进行的LLM解牌请求数上限，0为不限制")
+        },
+        "performance":{
+            "io_workers": ConfigField(type=int, default=4, description="处理图片读写和编码的工作线程数"),
+            "cpu_workers": ConfigField(type=int, default=0, description="处理图片解码和重新编码的工作进程数，0为不启用进程池（使用工作线程）")
+        },
+        "composite":{
+            "enable_composite": ConfigField(type=bool, default=False, description="是否把整个牌阵拼成一张图片发送（逆位牌会倒置并标注位置），关闭时逐张发送"),
+            "thumb_width": ConfigField(type=int, default=240, description="拼图中每张牌的宽度（像素）"),
+            "font_path": ConfigField(type=str, default="", description="拼图位置标签使用的中文字体文件路径，留空时自动查找系统字体，找不到时只标注序号")
+        },
+        "send":{
+            "global_rate": ConfigField(type=float, default=5.0, description="插件全局每秒最多发送的消息数，0为不限速"),
+            "global_burst": ConfigField(type=int, default=10, description="插件全局允许瞬间连发的消息数"),
+            "chat_rate": ConfigField(type=float, default=2.0, description="单个聊天每秒最多发送的消息数，0为不限速"),
+            "chat_burst": ConfigField(type=int, default=3, description="单个聊天允许瞬间连发的消息数")
+        },
         "permissions": {
             "admin_users": ConfigField(type=List, default=["123456789"], description="请写入被许可用户的QQ号，记得用英文单引号包裹并使用逗号分隔。这个配置会决定谁被允许使用塔罗牌指令，注意，这个选项支持热重载（你可以不重启麦麦，改动会即刻生效）"),
         },
@@ -820,4 +1899,8 @@ class TarotsPlugin(BasePlugin):
         if self.get_config("components.enable_tarots_command", True):
             components.append((TarotsCommand.get_command_info(), TarotsCommand))
 
+        # 生命周期事件处理器，负责缓存预热和释放共享资源
+        components.append((TarotsStartHandler.get_handler_info(), TarotsStartHandler))
+        components.append((TarotsStopHandler.get_handler_info(), TarotsStopHandler))
+
         return components
\ No newline at end of file
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+# 聊天流限速桶闲置超过该时间（秒）后回收
+IDLE_BUCKET_TTL = 600
+
+
+class TokenBucket:
+    """
+    令牌桶限速器（预约式）：令牌不足时直接预约未来的令牌并返回需要等待的时间，
+    多个等待者按预约顺序依次放行，不会相互插队。
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def configure(self, rate: float, burst: float):
+        self._refill()
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = min(self.tokens, self.burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """
+        预约一个令牌
+        :return: 需要等待的秒数，速率不大于0时视为不限速
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    @property
+    def idle_since(self) -> float:
+        """最后一次预约（或刷新）的时间"""
+        return self.updated
+
+
+class SendScheduler:
+    """
+    发送调度器：每次发送图片或文本前，先向所在聊天流的令牌桶预约并等待，再向全局令牌桶预约，
+    适配器空闲时立即放行，繁忙时按配置的速率排队，取代固定的sleep。
+    全局令牌只在聊天流放行之后才预约，单个聊天积压的发送不会提前占用全局额度、挤在其他空闲聊天之前。
+    """
+
+    def __init__(self, global_rate: float = 5.0, global_burst: float = 10, chat_rate: float = 2.0, chat_burst: float = 3):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._last_prune = time.monotonic()
+
+    def configure(self, global_rate: float, global_burst: float, chat_rate: float, chat_burst: float):
+        """热更新速率配置"""
+        if (global_rate, global_burst) != (self.global_bucket.rate, self.global_bucket.burst):
+            self.global_bucket.configure(global_rate, global_burst)
+        if (chat_rate, chat_burst) != (self.chat_rate, self.chat_burst):
+            self.chat_rate = chat_rate
+            self.chat_burst = chat_burst
+            for bucket in self._chat_buckets.values():
+                bucket.configure(chat_rate, chat_burst)
+
+    async def acquire(self, chat_id: Optional[str]):
+        """等待直到允许向该聊天流发送下一条消息"""
+        self._prune()
+        if chat_id:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            wait = bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        wait = self.global_bucket.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < IDLE_BUCKET_TTL:
+            return
+        self._last_prune = now
+        for chat_id in [cid for cid, bucket in self._chat_buckets.items() if now - bucket.idle_since > IDLE_BUCKET_TTL]:
+            del self._chat_buckets[chat_id]
+
+
+send_scheduler = SendScheduler()
@@ -0,0 +1,182 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("tarots_stats_tool")
+
+
+class RollingHistogram:
+    """
+    滚动耗时直方图：只保留最近 window 个样本用于计算分位数，
+    同时累计全部样本的次数和总耗时。
+    """
+
+    def __init__(self, window: int = 512):
+        self._samples: Deque[float] = deque(maxlen=max(1, window))
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+
+    def resize(self, window: int):
+        window = max(1, window)
+        if window != self._samples.maxlen:
+            self._samples = deque(self._samples, maxlen=window)
+
+    def add(self, seconds: float, error: bool = False):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if error:
+            self.errors += 1
+
+    def percentile(self, fraction: float) -> float:
+        """最近窗口内的分位数（秒），没有样本时返回0"""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+        return ordered[index]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+        }
+
+
+class StageMetrics:
+    """
+    插件各阶段（配置读取、牌组加载、缓存校验、下载、旋转、发送、LLM重写等）的耗时和计数统计。
+    计时用 span() 上下文管理器或 timed() 装饰器，计数用 incr()。
+    """
+
+    def __init__(self, window: int = 512, log_interval: float = 0):
+        self.window = window
+        self.log_interval = log_interval
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, RollingHistogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._last_log = time.monotonic()
+
+    def configure(self, window: Optional[int] = None, log_interval: Optional[float] = None):
+        """调整窗口大小和定期日志间隔（秒，0为关闭）"""
+        with self._lock:
+            if window is not None and window != self.window:
+                self.window = window
+                for histogram in self._stages.values():
+                    histogram.resize(window)
+            if log_interval is not None:
+                self.log_interval = log_interval
+
+    def record(self, stage: str, seconds: float, error: bool = False):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = RollingHistogram(self.window)
+            histogram.add(seconds, error)
+        self._maybe_log()
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """统计代码块耗时，块内抛出异常时记为一次错误"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(stage, time.perf_counter() - start, error=True)
+            raise
+        self.record(stage, time.perf_counter() - start)
+
+    def timed(self, stage: str) -> Callable:
+        """统计函数（同步或协程）每次调用耗时的装饰器"""
+
+        def decorator(func: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(stage):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uptime": time.monotonic() - self.started_at,
+                "stages": {stage: histogram.summary() for stage, histogram in self._stages.items()},
+                "counters": dict(self._counters),
+            }
+
+    def format_lines(self, extra: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        生成可读的统计报告
+        :param extra: 附加的 名称→值 行（例如内存缓存命中率）
+        """
+        data = self.snapshot()
+        lines = [f"统计时长 {data['uptime'] / 60:.1f} 分钟"]
+        for stage, summary in sorted(data["stages"].items()):
+            line = (
+                f"{stage}: {summary['count']}次 p50 {summary['p50_ms']:.1f}ms "
+                f"p95 {summary['p95_ms']:.1f}ms p99 {summary['p99_ms']:.1f}ms"
+            )
+            if summary["errors"]:
+                line += f" 失败{summary['errors']}次"
+            lines.append(line)
+        counters = data["counters"]
+        hits, misses = counters.get("disk_cache.hit", 0), counters.get("disk_cache.miss", 0)
+        if hits + misses:
+            lines.append(f"本地图片缓存命中率: {hits / (hits + misses):.1%}（{hits}/{hits + misses}）")
+        for name, value in sorted(counters.items()):
+            if name.startswith("bytes."):
+                lines.append(f"{name}: {value / 1024 / 1024:.2f}MB")
+            elif not name.startswith("disk_cache."):
+                lines.append(f"{name}: {value}")
+        for name, value in (extra or {}).items():
+            lines.append(f"{name}: {value}")
+        return lines
+
+    def _maybe_log(self):
+        if not self.log_interval:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_log < self.log_interval:
+                return
+            self._last_log = now
+        stages = self.snapshot()["stages"]
+        parts = [
+            f"{stage} n={summary['count']} p50={summary['p50_ms']:.0f}ms p95={summary['p95_ms']:.0f}ms"
+            for stage, summary in sorted(stages.items())
+        ]
+        logger.info("[塔罗牌统计] " + "; ".join(parts))
+
+
+metrics = StageMetrics()
+timed = metrics.timed
@@ -0,0 +1,49 @@
+"""
+离线测试的公共夹具：复用基准测试的沙盒和 MaiBot 桩模块，
+在临时目录中导入一份插件包，测试不会改动仓库中的配置和缓存文件。
+"""
+
+import importlib
+import shutil
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+BENCH_DIR = Path(__file__).parent.parent.absolute() / "benchmarks"
+sys.path.insert(0, str(BENCH_DIR))
+import maibot_stub  # noqa: E402
+import run_benchmarks  # noqa: E402
+
+DECK = "bilibili"
+
+
+@pytest.fixture(scope="session")
+def tarots():
+    """沙盒中的插件包，属性为各个模块（plugin、deck_tool、send_tool……）"""
+    root = run_benchmarks.prepare_sandbox(DECK, 32)
+    maibot_stub.install()
+    sys.path.insert(0, str(root))
+    package = run_benchmarks.PACKAGE_NAME
+    modules = {
+        name: importlib.import_module(f"{package}.{name}")
+        for name in ("plugin", "deck_tool", "pack_tool", "cache_tool", "send_tool", "draw_tool", "interpretation_tool")
+    }
+    yield SimpleNamespace(root=root / package, deck=DECK, **modules)
+    modules["plugin"].worker_pool.shutdown()
+    sys.path.remove(str(root))
+    shutil.rmtree(root, ignore_errors=True)
+
+
+@pytest.fixture
+def new_action(tarots):
+    """创建一个使用沙盒牌组的 TarotsAction"""
+    def factory(formation: str = "单张"):
+        return tarots.plugin.TarotsAction(
+            action_data={"card_type": "全部", "formation": formation, "target_message": "测试用户:抽一张"},
+            reasoning="",
+            cycle_timers={},
+            thinking_id="",
+        )
+    return factory
@@ -0,0 +1,18 @@
+import asyncio
+
+
+def test_follower_gets_variants_when_leader_did_not_prepare_them(tarots, new_action):
+    action = new_action()
+    deck_cache = action.deck_cache
+    rev_path = deck_cache.rev_path("2")
+    rev_path.unlink(missing_ok=True)
+
+    async def main():
+        # 抽牌（不生成派生图片）先发起，缓存指令（需要派生图片）共享同一次校验
+        return await asyncio.gather(
+            action._ensure_card_cached("2"),
+            action._ensure_card_cached("2", prepare_variants=True),
+        )
+
+    assert asyncio.run(main()) == [(True, False), (True, False)]
+    assert rev_path.exists()
@@ -0,0 +1,6 @@
+def test_seeded_reading_does_not_depend_on_numpy(tarots, monkeypatch):
+    draw_tool = tarots.draw_tool
+    seed = tarots.plugin.fortune_seed("qq:10001", tarots.plugin.fortune_day(), tarots.deck)
+    with_numpy = draw_tool.draw_reading("全部", 3, True, seed)
+    monkeypatch.setattr(draw_tool, "np", None)
+    assert draw_tool.draw_reading("全部", 3, True, seed) == with_numpy
@@ -0,0 +1,12 @@
+def test_reconfigure_after_close_reopens_database(tarots, tmp_path):
+    cache = tarots.interpretation_tool.InterpretationCache()
+    db_path = tmp_path / "interpretations.db"
+    cache.configure(db_path=db_path)
+    assert cache.stats()["persistent"]
+
+    # 插件在同一进程内重新加载：先关闭，再用相同路径配置
+    cache.close()
+    assert not cache.stats()["persistent"]
+    cache.configure(db_path=db_path)
+    assert cache.stats()["persistent"]
+    cache.close()
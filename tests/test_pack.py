@@ -0,0 +1,40 @@
+import asyncio
+import base64
+import os
+
+
+def test_redownloaded_card_is_served_instead_of_packed_copy(tarots, new_action):
+    action = new_action()
+    # 直接发送原图，便于逐字节比对
+    action._get_transport_profile = lambda: None
+    registry = tarots.deck_tool.deck_registry
+    deck_cache = action.deck_cache
+    card_path = deck_cache.norm_path("0")
+    old_bytes = card_path.read_bytes()
+    new_bytes = deck_cache.norm_path("1").read_bytes()
+    assert old_bytes != new_bytes
+
+    pack_path = registry.pack_path(tarots.deck)
+    tarots.pack_tool.build_pack(
+        pack_path,
+        tarots.deck,
+        registry.get_deck(tarots.deck),
+        registry.get_formations(tarots.deck),
+        [(("0", "norm", "original"), card_path, card_path.name)],
+    )
+    registry.invalidate(tarots.deck)
+    try:
+        assert asyncio.run(action._get_card_payload("0", False)) == base64.b64encode(old_bytes).decode()
+
+        # 模拟 /tarots cache refresh 重新下载到新内容：原图被替换，派生图片和内存负载被清除
+        card_path.write_bytes(new_bytes)
+        pack_mtime = pack_path.stat().st_mtime_ns
+        os.utime(card_path, ns=(pack_mtime + 10**9, pack_mtime + 10**9))
+        deck_cache.discard_derived("0")
+
+        assert asyncio.run(action._get_card_payload("0", False)) == base64.b64encode(new_bytes).decode()
+    finally:
+        registry.invalidate(tarots.deck)
+        pack_path.unlink()
+        card_path.write_bytes(old_bytes)
+        deck_cache.discard_derived("0")
@@ -0,0 +1,21 @@
+import asyncio
+import time
+
+
+def test_backlogged_chat_does_not_delay_idle_chat(tarots):
+    scheduler = tarots.send_tool.SendScheduler(global_rate=10, global_burst=1, chat_rate=2, chat_burst=1)
+
+    async def main():
+        # 聊天A一次发送10张牌面，按每秒2条的聊天速率要排队约4.5秒
+        backlog = [asyncio.ensure_future(scheduler.acquire("chat_a")) for _ in range(10)]
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        await scheduler.acquire("chat_b")
+        idle_wait = time.monotonic() - started
+        for task in backlog:
+            task.cancel()
+        await asyncio.gather(*backlog, return_exceptions=True)
+        return idle_wait
+
+    # 空闲的聊天B只需等待全局速率下的一个令牌（0.1秒），而不是排在A尚未发生的发送之后
+    assert asyncio.run(main()) < 0.3
@@ -0,0 +1,87 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from .admission_tool import admission
+
+logger = logging.getLogger("tarots_worker_tool")
+
+
+class WorkerPool:
+    """
+    图片流水线的工作池，让文件读写、PIL解码/编码和base64编码都不在事件循环线程上执行。
+    - 线程池：文件读写、哈希、base64编码等（PIL和zlib在编解码时会释放GIL，线程池同样有效）
+    - 进程池（可选）：纯CPU的解码/重编码，只接受模块级函数和可序列化参数
+    """
+
+    def __init__(self, io_workers: int = 4, cpu_workers: int = 0):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self._io_executor: Optional[ThreadPoolExecutor] = None
+        self._cpu_executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def has_process_pool(self) -> bool:
+        return self.cpu_workers > 0
+
+    def configure(self, io_workers: int, cpu_workers: int):
+        """调整工作数，变化时替换对应的执行器（旧执行器处理完已提交的任务后退出）"""
+        io_workers = max(1, io_workers)
+        cpu_workers = max(0, cpu_workers)
+        if io_workers != self.io_workers:
+            self.io_workers = io_workers
+            self._io_executor = self._retire(self._io_executor)
+        if cpu_workers != self.cpu_workers:
+            self.cpu_workers = cpu_workers
+            self._cpu_executor = self._retire(self._cpu_executor)
+
+    def _get_io_executor(self) -> Executor:
+        if self._io_executor is None:
+            self._io_executor = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="tarots-io")
+        return self._io_executor
+
+    def _get_cpu_executor(self) -> Executor:
+        if not self.has_process_pool:
+            return self._get_io_executor()
+        if self._cpu_executor is None:
+            self._cpu_executor = ProcessPoolExecutor(max_workers=self.cpu_workers)
+        return self._cpu_executor
+
+    async def run_io(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """在线程池中执行阻塞的I/O操作"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_io_executor(), functools.partial(func, *args, **kwargs))
+
+    async def run_cpu(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        执行CPU密集操作：配置了进程池时放到进程池，否则放到线程池。
+        同时进行的CPU密集操作（图片处理、模拟抽牌）数受准入控制的 image 上限约束，避免占满线程池
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        async with admission.stage("image"):
+            try:
+                return await loop.run_in_executor(self._get_cpu_executor(), call)
+            except BrokenProcessPool as e:
+                # 进程池不可用（例如子进程被杀），本次及之后都退回线程池
+                logger.error(f"图片处理进程池异常，已退回线程池: {e}")
+                self._cpu_executor = self._retire(self._cpu_executor)
+                self.cpu_workers = 0
+                return await loop.run_in_executor(self._get_io_executor(), call)
+
+    @staticmethod
+    def _retire(executor: Optional[Executor]) -> None:
+        if executor is not None:
+            executor.shutdown(wait=False)
+        return None
+
+    def shutdown(self):
+        """关闭全部执行器（插件卸载或麦麦关闭时调用）"""
+        self._io_executor = self._retire(self._io_executor)
+        self._cpu_executor = self._retire(self._cpu_executor)
+
+
+worker_pool = WorkerPool()